@@ -1,22 +1,78 @@
-from flask import Flask
+from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app.routing import RoutingSession, REPLICA, init_routing
 import redis
 import os
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 redis_client = None
 
 def create_app():
     app = Flask(__name__)
 
+    from app.codec import FastJSONProvider, cache_codec
+    app.json = FastJSONProvider(app)
+
     # Configuration - use environment variables in production
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///hospital.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Pool sizing, timeouts and SQLite pragmas per backend, see app/engine.py
+    from app.engine import engine_options, configure_engine
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    # Optional read replica for GET requests and reporting tasks, see app/routing.py
+    replica_url = os.environ.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA: dict(engine_options(replica_url), url=replica_url)}
+    # Seconds a user reads from the primary after a write, to cover replication lag
+    app.config['REPLICA_PIN_SECONDS'] = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+    app.config['APPOINTMENT_SLOT_MINUTES'] = int(os.environ.get('APPOINTMENT_SLOT_MINUTES', 30))
+    # auto, sqlite-fts5, postgres-trgm or like
+    app.config['SEARCH_BACKEND'] = os.environ.get('SEARCH_BACKEND', 'auto')
+    # Maintain stat_counters alongside writes so the admin dashboard is an O(1) read
+    app.config['DASHBOARD_COUNTERS'] = os.environ.get('DASHBOARD_COUNTERS', 'false').lower() == 'true'
     
+    # session (cookie, default) or token (signed bearer tokens from /api/auth/login)
+    app.config['AUTH_MODE'] = os.environ.get('AUTH_MODE', 'session')
+    app.config['ACCESS_TOKEN_TTL'] = int(os.environ.get('ACCESS_TOKEN_TTL', 900))
+    app.config['REFRESH_TOKEN_TTL'] = int(os.environ.get('REFRESH_TOKEN_TTL', 7 * 24 * 3600))
+
+    # Password hashing runs in a per-worker process pool (0 workers = inline).
+    # Changing the method re-hashes each user's password on their next login.
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8))
+    app.config['PASSWORD_HASH_WAIT_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_WAIT_TIMEOUT', 5))
+    # Login attempts allowed per LOGIN_RATE_WINDOW seconds, per username and per client IP
+    app.config['LOGIN_RATE_LIMIT'] = int(os.environ.get('LOGIN_RATE_LIMIT', 10))
+    app.config['LOGIN_IP_RATE_LIMIT'] = int(os.environ.get('LOGIN_IP_RATE_LIMIT', 60))
+    app.config['LOGIN_RATE_WINDOW'] = int(os.environ.get('LOGIN_RATE_WINDOW', 60))
+    # Reverse proxies in front of the app (1 on Render). Their X-Forwarded-For gives the
+    # client IP the per-IP login limit keys on; 0 trusts no header, as it could be spoofed.
+    app.config['PROXY_FIX_HOPS'] = int(os.environ.get('PROXY_FIX_HOPS', 0))
+    if app.config['PROXY_FIX_HOPS']:
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app,
+            x_for=app.config['PROXY_FIX_HOPS'],
+            x_proto=app.config['PROXY_FIX_HOPS']
+        )
+
+    from app.passwords import password_hasher, HasherBusy
+    password_hasher.configure(
+        app.config['PASSWORD_HASH_METHOD'],
+        app.config['PASSWORD_HASH_WORKERS'],
+        app.config['PASSWORD_HASH_MAX_PENDING'],
+        app.config['PASSWORD_HASH_WAIT_TIMEOUT']
+    )
+
+    @app.errorhandler(HasherBusy)
+    def hasher_busy(e):
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+
     # Session configuration for cross-origin cookies
     app.config['SESSION_COOKIE_SAMESITE'] = 'None'
     app.config['SESSION_COOKIE_SECURE'] = True  # Required for SameSite=None
@@ -25,8 +81,41 @@ def create_app():
     # Redis configuration - optional
     redis_url = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
     app.config['REDIS_URL'] = redis_url
-    app.config['CELERY_BROKER_URL'] = redis_url
-    app.config['CELERY_RESULT_BACKEND'] = redis_url
+    app.config['CELERY_BROKER_URL'] = os.environ.get('CELERY_BROKER_URL', redis_url)
+    app.config['CELERY_RESULT_BACKEND'] = os.environ.get('CELERY_RESULT_BACKEND', redis_url)
+    app.config['REMINDER_BATCH_SIZE'] = int(os.environ.get('REMINDER_BATCH_SIZE', 500))
+    # stdout or file (JSON lines appended to NOTIFIER_FILE)
+    app.config['NOTIFIER_BACKEND'] = os.environ.get('NOTIFIER_BACKEND', 'stdout')
+    app.config['NOTIFIER_FILE'] = os.environ.get('NOTIFIER_FILE', 'notifications.log')
+    app.config['REPORTS_DIR'] = os.environ.get('REPORTS_DIR', 'reports')
+    app.config['REPORT_BATCH_SIZE'] = int(os.environ.get('REPORT_BATCH_SIZE', 50))
+    app.config['EXPORT_DIR'] = os.environ.get('EXPORT_DIR', 'exports')
+    # Default for gzipping CSV exports; a request can override it
+    app.config['EXPORT_COMPRESS'] = os.environ.get('EXPORT_COMPRESS', 'false').lower() == 'true'
+    # Columnar (Parquet) warehouse export; rows changed in the last WAREHOUSE_SETTLE_SECONDS
+    # wait for the next run, so keep it above the longest write transaction and replica lag
+    app.config['WAREHOUSE_DIR'] = os.environ.get('WAREHOUSE_DIR', 'warehouse')
+    app.config['WAREHOUSE_BATCH_SIZE'] = int(os.environ.get('WAREHOUSE_BATCH_SIZE', 5000))
+    app.config['WAREHOUSE_SETTLE_SECONDS'] = int(os.environ.get('WAREHOUSE_SETTLE_SECONDS', 60))
+    app.config['REDIS_MAX_CONNECTIONS'] = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))
+    app.config['REDIS_SOCKET_TIMEOUT'] = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 0.25))
+    app.config['REDIS_FAILURE_THRESHOLD'] = int(os.environ.get('REDIS_FAILURE_THRESHOLD', 5))
+    app.config['REDIS_RESET_TIMEOUT'] = float(os.environ.get('REDIS_RESET_TIMEOUT', 30))
+
+    # Per-worker L1 cache in front of Redis; also the only cache when Redis is down
+    app.config['L1_CACHE_MAX_BYTES'] = int(os.environ.get('L1_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    app.config['L1_CACHE_TTL'] = int(os.environ.get('L1_CACHE_TTL', 30))
+
+    from app.local_cache import local_cache
+    local_cache.configure(app.config['L1_CACHE_MAX_BYTES'], app.config['L1_CACHE_TTL'])
+
+    # Seconds a user's role/active flag may be served from cache; deactivation invalidates it at once
+    app.config['PRINCIPAL_CACHE_TTL'] = int(os.environ.get('PRINCIPAL_CACHE_TTL', 60))
+
+    # Cached values at least this large are zlib-compressed in Redis (0 disables)
+    app.config['CACHE_COMPRESS_MIN_BYTES'] = int(os.environ.get('CACHE_COMPRESS_MIN_BYTES', 4096))
+    app.config['CACHE_COMPRESS_LEVEL'] = int(os.environ.get('CACHE_COMPRESS_LEVEL', 1))
+    cache_codec.configure(app.config['CACHE_COMPRESS_MIN_BYTES'], app.config['CACHE_COMPRESS_LEVEL'])
 
     # Initialize extensions
     db.init_app(app)
@@ -41,29 +130,63 @@ def create_app():
          expose_headers=["Content-Type"],
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
 
-    # Initialize Redis - make it optional
+    # Initialize Redis - make it optional. One pool per process with short
+    # timeouts; the circuit breaker skips cache calls while Redis is down and
+    # probes again after REDIS_RESET_TIMEOUT seconds.
     global redis_client
+    from app.redis_breaker import redis_breaker
+    from app.local_cache import start_invalidation_listener
+
+    redis_breaker.configure(app.config['REDIS_FAILURE_THRESHOLD'], app.config['REDIS_RESET_TIMEOUT'])
+    if redis_client is None:
+        pool = redis.ConnectionPool.from_url(
+            app.config['REDIS_URL'],
+            max_connections=app.config['REDIS_MAX_CONNECTIONS'],
+            socket_timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+            socket_connect_timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+            health_check_interval=30
+        )
+        redis_client = redis.Redis(connection_pool=pool)
+
     try:
-        redis_client = redis.from_url(app.config['REDIS_URL'])
         redis_client.ping()  # Test connection
+        redis_breaker.record_success()
         print("✓ Redis connected successfully")
     except Exception as e:
-        print(f"⚠ Redis not available: {e}")
+        redis_breaker.trip(e)
         print("⚠ Background jobs (reminders, reports, CSV export) will be disabled")
-        redis_client = None
+
+    start_invalidation_listener(redis_client)
 
 
     # Register blueprints
-    from app.routes import auth, admin, doctor, patient, appointments
+    from app.routes import auth, admin, doctor, patient, appointments, health
+    app.register_blueprint(health.bp)
     app.register_blueprint(auth.bp)
     app.register_blueprint(admin.bp)
     app.register_blueprint(doctor.bp)
     app.register_blueprint(patient.bp)
     app.register_blueprint(appointments.bp)
 
+    init_routing(app)
+
+    from app.celery_app import init_celery
+    from app.notifiers import init_notifier
+    init_celery(app)
+    init_notifier(app)
+
     # Create database tables and admin user
     with app.app_context():
+        for engine in db.engines.values():
+            configure_engine(engine)
         db.create_all()
+
+        # An unmigrated database would fail the queries below; answer 503 until it is
+        # upgraded, but still build the app so `flask db upgrade` itself can run
+        from app.schema import init_schema_check
+        if not init_schema_check(app):
+            return app
+
         from app.models import User
 
         # Create admin if doesn't exist
@@ -80,4 +203,9 @@ def create_app():
             db.session.commit()
             print("Admin user created: username='admin', password='admin123'")
 
+        from app.search import init_search
+        from app.counters import init_counters
+        init_search(app)
+        init_counters(app)
+
     return app
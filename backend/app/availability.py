@@ -0,0 +1,105 @@
+from flask import current_app
+from app.models import Appointment, DoctorAvailability
+from datetime import datetime, date, timedelta
+
+MAX_RANGE_DAYS = 31
+
+
+def slot_minutes():
+    """Length of a bookable slot, from APPOINTMENT_SLOT_MINUTES"""
+    return current_app.config.get('APPOINTMENT_SLOT_MINUTES', 30)
+
+
+def expand_window(start_time, end_time, minutes):
+    """Split an availability window into slot start times; a slot must end by end_time"""
+    slots = []
+    step = timedelta(minutes=minutes)
+    current = datetime.combine(date.min, start_time)
+    end = datetime.combine(date.min, end_time)
+    while current + step <= end:
+        slots.append(current.time())
+        current += step
+    return slots
+
+
+def slot_grid(doctor_ids, date_from, date_to):
+    """Free slot grid for several doctors over an inclusive date range.
+
+    Issues two queries regardless of the number of doctors or days: one for
+    availability windows and one for booked appointments, which are then
+    subtracted from the expanded windows in Python.
+    Returns {doctor_id: {date: [time, ...]}} with only dates that have windows.
+    """
+    if not doctor_ids:
+        return {}
+
+    minutes = slot_minutes()
+
+    windows = DoctorAvailability.query.filter(
+        DoctorAvailability.doctor_id.in_(doctor_ids),
+        DoctorAvailability.date >= date_from,
+        DoctorAvailability.date <= date_to,
+        DoctorAvailability.is_available == True
+    ).all()
+
+    booked = Appointment.query.with_entities(
+        Appointment.doctor_id, Appointment.appointment_date, Appointment.appointment_time
+    ).filter(
+        Appointment.doctor_id.in_(doctor_ids),
+        Appointment.appointment_date >= date_from,
+        Appointment.appointment_date <= date_to,
+        Appointment.status == 'booked'
+    ).all()
+    taken = {tuple(row) for row in booked}
+
+    grid = {doctor_id: {} for doctor_id in doctor_ids}
+    for window in windows:
+        slots = [
+            slot for slot in expand_window(window.start_time, window.end_time, minutes)
+            if (window.doctor_id, window.date, slot) not in taken
+        ]
+        grid[window.doctor_id][window.date] = slots
+
+    return grid
+
+
+def serialize_grid(grid):
+    """Convert a slot grid into JSON-friendly strings"""
+    return {
+        str(doctor_id): {
+            day.isoformat(): [slot.strftime('%H:%M') for slot in slots]
+            for day, slots in sorted(days.items())
+        }
+        for doctor_id, days in grid.items()
+    }
+
+
+def is_slot_on_grid(doctor_id, appointment_date, appointment_time):
+    """Whether a time is a slot inside the doctor's availability for that day.
+
+    Booked slots are not excluded here; the uq_appointments_booked_slot index
+    rejects conflicting bookings.
+    """
+    window = DoctorAvailability.query.filter(
+        DoctorAvailability.doctor_id == doctor_id,
+        DoctorAvailability.date == appointment_date,
+        DoctorAvailability.is_available == True
+    ).first()
+
+    if not window:
+        return False
+
+    return appointment_time in expand_window(window.start_time, window.end_time, slot_minutes())
+
+
+def parse_range(date_from, date_to):
+    """Parse and validate a YYYY-MM-DD date range; raises ValueError"""
+    start = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else date.today()
+    end = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else start + timedelta(days=6)
+
+    if end < start:
+        raise ValueError('date_to must not be before date_from')
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'Date range cannot exceed {MAX_RANGE_DAYS} days')
+
+    return start, end
@@ -0,0 +1,60 @@
+from celery import Celery, Task
+from celery.signals import worker_process_init
+import os
+
+
+class FlaskTask(Task):
+    """Runs every task inside the Flask app's context, building the app once per process"""
+
+    def __call__(self, *args, **kwargs):
+        with flask_app().app_context():
+            return self.run(*args, **kwargs)
+
+
+celery = Celery('tasks', task_cls=FlaskTask)
+celery.flask_app = None
+
+# Same environment defaults as create_app(), so a worker pointed straight at
+# this module (celery -A app.tasks.celery) still finds the broker
+_redis_url = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+celery.conf.update(
+    broker_url=os.environ.get('CELERY_BROKER_URL', _redis_url),
+    result_backend=os.environ.get('CELERY_RESULT_BACKEND', _redis_url),
+    broker_connection_retry_on_startup=True
+)
+
+
+def init_celery(app):
+    """Configure the shared Celery app from a Flask app's config and bind it to that app"""
+    celery.conf.update(
+        broker_url=app.config['CELERY_BROKER_URL'],
+        result_backend=app.config['CELERY_RESULT_BACKEND'],
+        broker_connection_retry_on_startup=True
+    )
+    celery.flask_app = app
+    app.extensions['celery'] = celery
+    return celery
+
+
+def flask_app():
+    """The Flask app tasks run in; created on first use when the worker was started without one"""
+    if celery.flask_app is None:
+        from app import create_app
+        create_app()
+    return celery.flask_app
+
+
+@worker_process_init.connect
+def reset_after_fork(**kwargs):
+    """Prefork children must not share the parent's database connections or listener thread"""
+    if celery.flask_app is None:
+        return
+
+    import app as app_module
+    from app import db
+    from app.local_cache import start_invalidation_listener
+
+    with celery.flask_app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    start_invalidation_listener(app_module.redis_client)
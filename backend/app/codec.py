@@ -0,0 +1,86 @@
+from flask.json.provider import DefaultJSONProvider
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
+
+# First byte of every cached value. New formats get a new byte so values
+# written by older workers can still be read during a rolling deploy.
+FORMAT_JSON = b'\x01'
+FORMAT_JSON_ZLIB = b'\x02'
+
+
+def dumps(value):
+    """Encode value as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(',', ':')).encode()
+
+
+def loads(data):
+    """Decode JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class CacheCodec:
+    """Serializes cache values to tagged bytes, zlib-compressing those above compress_min_bytes"""
+
+    def __init__(self, compress_min_bytes=4096, compress_level=1):
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+
+    def configure(self, compress_min_bytes, compress_level):
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+
+    def encode(self, value):
+        payload = dumps(value)
+        if 0 < self.compress_min_bytes <= len(payload):
+            return FORMAT_JSON_ZLIB + zlib.compress(payload, self.compress_level)
+        return FORMAT_JSON + payload
+
+    def decode(self, data):
+        tag, payload = data[:1], data[1:]
+        if tag == FORMAT_JSON:
+            return loads(payload)
+        if tag == FORMAT_JSON_ZLIB:
+            return loads(zlib.decompress(payload))
+        # Untagged values were written as plain JSON before the codec existed
+        return loads(data)
+
+
+cache_codec = CacheCodec()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes responses with orjson when it is installed.
+
+    Dates and datetimes are still passed to the default hook, so responses
+    are formatted exactly as with the stdlib provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        # response() passes either compact separators or indent=2, both of
+        # which orjson can produce; anything else goes to the stdlib encoder
+        indent = kwargs.get('indent')
+        separators = kwargs.get('separators')
+        if (orjson is None or set(kwargs) - {'indent', 'separators'}
+                or indent not in (None, 2) or separators not in (None, (',', ':'))):
+            return super().dumps(obj, **kwargs)
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
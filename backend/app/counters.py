@@ -0,0 +1,212 @@
+from flask import current_app
+from sqlalchemy import select, func, case, literal, true, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import User, Doctor, Patient, Appointment, StatCounter, DoctorStats
+
+# Dashboard fields, each backed by one row of stat_counters
+COUNTERS = [
+    'total_doctors',
+    'total_patients',
+    'total_appointments',
+    'pending_appointments',
+    'completed_appointments',
+    'cancelled_appointments',
+]
+
+STATUS_COUNTERS = {
+    'booked': 'pending_appointments',
+    'completed': 'completed_appointments',
+    'cancelled': 'cancelled_appointments',
+}
+
+
+def counters_enabled():
+    return current_app.config.get('DASHBOARD_COUNTERS', False)
+
+
+# Dialects whose insert() supports ON CONFLICT, needed for the atomic rebuild
+UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def dashboard_select():
+    """All dashboard counts as one row, one column per counter"""
+    active_doctors = select(func.count(Doctor.id)).join(User).where(User.is_active == True).scalar_subquery()
+    active_patients = select(func.count(Patient.id)).join(User).where(User.is_active == True).scalar_subquery()
+
+    columns = [
+        active_doctors,
+        active_patients,
+        func.count(Appointment.id),
+        func.count(case((Appointment.status == 'booked', 1))),
+        func.count(case((Appointment.status == 'completed', 1))),
+        func.count(case((Appointment.status == 'cancelled', 1)))
+    ]
+    return select(*[column.label(name) for name, column in zip(COUNTERS, columns)]).select_from(Appointment)
+
+
+def aggregate_dashboard():
+    """Compute all dashboard counts in a single statement"""
+    return dict(db.session.execute(dashboard_select()).one()._mapping)
+
+
+def read_counters():
+    """Read the maintained dashboard counts (one primary-key scan of a six-row table)"""
+    values = dict(db.session.query(StatCounter.name, StatCounter.value).all())
+    return {name: values.get(name, 0) for name in COUNTERS}
+
+
+def rebuild_counters(overwrite=True):
+    """Set stat_counters from the live tables in one INSERT ... SELECT ... ON CONFLICT.
+
+    Counting and writing are a single statement, so bumps cannot land between
+    them and concurrent rebuilds cannot collide on the insert. With overwrite
+    off only missing rows are created and maintained values are left alone.
+    """
+    dialect = db.engine.dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise RuntimeError(f"Counter rebuild needs SQLite or PostgreSQL, not {dialect}")
+
+    totals = dashboard_select().cte('totals')
+    rows = union_all(*[
+        select(literal(name).label('name'), totals.c[name].label('value'))
+        for name in COUNTERS
+    ]).subquery()
+    # SQLite needs a WHERE before ON CONFLICT to tell it apart from a join constraint
+    source = select(rows.c.name, rows.c.value).where(true())
+    statement = UPSERT_INSERTS[dialect](StatCounter).from_select(['name', 'value'], source)
+    if overwrite:
+        statement = statement.on_conflict_do_update(
+            index_elements=['name'], set_={'value': statement.excluded.value}
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=['name'])
+
+    if dialect == 'postgresql':
+        # The count is taken from the statement's snapshot: make in-flight bumps
+        # commit before it instead of being overwritten after it
+        db.session.execute(db.text('LOCK TABLE stat_counters IN EXCLUSIVE MODE'))
+    db.session.execute(statement)
+    db.session.commit()
+    return read_counters()
+
+
+def bump(name, delta=1):
+    """Adjust a counter in the caller's transaction; no-op unless DASHBOARD_COUNTERS is on"""
+    if not counters_enabled() or not delta:
+        return
+    db.session.execute(
+        StatCounter.__table__.update()
+        .where(StatCounter.name == name)
+        .values(value=StatCounter.value + delta)
+    )
+
+
+def bump_doctor(doctor_id, **deltas):
+    """Adjust a doctor's running totals in the caller's transaction.
+
+    The first write for a doctor creates the row from the appointments table
+    in the same transaction, so no change is ever left uncounted.
+    """
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    update = (
+        DoctorStats.__table__.update()
+        .where(DoctorStats.doctor_id == doctor_id)
+        .values({column: getattr(DoctorStats, column) + delta for column, delta in deltas.items()})
+    )
+    if db.session.execute(update).rowcount:
+        return
+
+    values = doctor_totals(doctor_id)
+    for column, delta in deltas.items():
+        values[column] += delta
+    try:
+        with db.session.begin_nested():
+            db.session.add(DoctorStats(doctor_id=doctor_id, **values))
+    except IntegrityError:
+        # Another transaction created the row first
+        db.session.execute(update)
+
+
+def record_status_change(appointment, new_status):
+    """Move one appointment between status counters; call before changing appointment.status"""
+    old_status = appointment.status
+    if old_status == new_status:
+        return
+    if old_status in STATUS_COUNTERS:
+        bump(STATUS_COUNTERS[old_status], -1)
+    if new_status in STATUS_COUNTERS:
+        bump(STATUS_COUNTERS[new_status], 1)
+
+    completed_delta = (new_status == 'completed') - (old_status == 'completed')
+    bump_doctor(appointment.doctor_id, completed_appointments=completed_delta)
+
+
+def record_new_appointment(appointment):
+    """Count a new appointment; call before adding it to the session"""
+    bump('total_appointments', 1)
+    if appointment.status in STATUS_COUNTERS:
+        bump(STATUS_COUNTERS[appointment.status], 1)
+
+    first_visit = not db.session.query(
+        Appointment.query.filter_by(
+            doctor_id=appointment.doctor_id,
+            patient_id=appointment.patient_id
+        ).exists()
+    ).scalar()
+    bump_doctor(appointment.doctor_id, total_appointments=1, total_patients=int(first_visit))
+
+
+def doctor_totals(doctor_id):
+    """A doctor's totals counted from the appointments table"""
+    query = Appointment.query.filter(Appointment.doctor_id == doctor_id)
+    return {
+        'total_patients': query.with_entities(func.count(func.distinct(Appointment.patient_id))).scalar(),
+        'total_appointments': query.count(),
+        'completed_appointments': query.filter(Appointment.status == 'completed').count()
+    }
+
+
+def doctor_stats(doctor_id):
+    """A doctor's running totals, computed from the appointments table the first time"""
+    stats = DoctorStats.query.get(doctor_id)
+    if stats:
+        return stats
+
+    stats = DoctorStats(doctor_id=doctor_id, **doctor_totals(doctor_id))
+    db.session.add(stats)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A booking or another request created the row first
+        db.session.rollback()
+        stats = DoctorStats.query.get(doctor_id)
+    return stats
+
+
+def init_counters(app):
+    """Fill missing counters at startup and register `flask rebuild-counters`; call inside an app context.
+
+    Startup never changes existing rows: Celery workers, scripts and CLI
+    commands build the app too, possibly with other settings, while web
+    workers are maintaining the counters. Rows left from a period with
+    DASHBOARD_COUNTERS off are stale; recount them with the command.
+    """
+    @app.cli.command('rebuild-counters')
+    def rebuild_counters_command():
+        """Recount the dashboard counters from the live tables."""
+        if not counters_enabled():
+            print("⚠ DASHBOARD_COUNTERS is off; nothing to rebuild")
+            return
+        for name, value in rebuild_counters().items():
+            print(f"✓ {name} = {value}")
+
+    if app.config.get('DASHBOARD_COUNTERS'):
+        rebuild_counters(overwrite=False)
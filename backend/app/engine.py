@@ -0,0 +1,77 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+import os
+
+# Engine settings per database backend. Each value can be overridden with the
+# environment variable of the same name.
+ENGINE_PROFILES = {
+    'sqlite': {
+        # WAL lets readers run alongside the single writer; writers queue on
+        # busy_timeout instead of failing with "database is locked"
+        'SQLITE_JOURNAL_MODE': 'WAL',
+        'SQLITE_SYNCHRONOUS': 'NORMAL',
+        'SQLITE_BUSY_TIMEOUT_MS': 15000,
+        'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    },
+    'postgresql': {
+        'DB_POOL_SIZE': 10,
+        'DB_MAX_OVERFLOW': 20,
+        'DB_POOL_TIMEOUT': 10,
+        'DB_POOL_RECYCLE': 1800,
+        'DB_STATEMENT_TIMEOUT_MS': 30000,
+    },
+}
+
+
+def database_backend(uri):
+    """Backend name of a database URI ('sqlite', 'postgresql', ...)"""
+    return make_url(uri).get_backend_name()
+
+
+def engine_profile(uri):
+    """Settings of the profile for uri's backend, with environment overrides applied"""
+    profile = {}
+    for name, default in ENGINE_PROFILES.get(database_backend(uri), {}).items():
+        value = os.environ.get(name, default)
+        profile[name] = type(default)(value)
+    return profile
+
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for uri"""
+    backend = database_backend(uri)
+    profile = engine_profile(uri)
+
+    if backend == 'sqlite':
+        # SQLAlchemy's default pool for SQLite files is already right; only the
+        # driver-level lock wait needs raising from its 5 second default
+        return {'connect_args': {'timeout': profile['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+
+    if backend == 'postgresql':
+        return {
+            'pool_size': profile['DB_POOL_SIZE'],
+            'max_overflow': profile['DB_MAX_OVERFLOW'],
+            'pool_timeout': profile['DB_POOL_TIMEOUT'],
+            'pool_recycle': profile['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+            'connect_args': {'options': f"-c statement_timeout={profile['DB_STATEMENT_TIMEOUT_MS']}"},
+        }
+
+    return {'pool_pre_ping': True}
+
+
+def configure_engine(engine):
+    """Per-connection setup that cannot be expressed as engine options; call before first use"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    profile = engine_profile(str(engine.url))
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={profile['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA synchronous={profile['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={profile['SQLITE_BUSY_TIMEOUT_MS']}")
+        cursor.execute(f"PRAGMA mmap_size={profile['SQLITE_MMAP_SIZE']}")
+        cursor.close()
@@ -0,0 +1,128 @@
+from collections import OrderedDict, defaultdict
+from app.redis_breaker import redis_breaker
+import os
+import threading
+import time
+
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+
+class LocalCache:
+    """Per-process LRU cache bounded by total payload bytes, with a TTL cap.
+
+    Sits in front of Redis in app.utils. Entries are dropped by namespace on
+    invalidation; other workers learn about invalidations over Redis pub/sub.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, max_ttl=30):
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self.size = 0
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {'l1_hits': 0, 'redis_hits': 0, 'misses': 0})
+
+    def configure(self, max_bytes, max_ttl):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self.max_ttl = max_ttl
+            self._evict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self._stats[key.split(':')[0]]['l1_hits'] += 1
+            return value
+
+    def set(self, key, value, size, ttl):
+        if self.max_bytes <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + min(ttl, self.max_ttl))
+            self.size += size
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate(self, namespace):
+        """Drop the namespace itself and every key beneath it ('patient' drops 'patient:5:...')"""
+        prefix = namespace + ':'
+        with self._lock:
+            for key in [key for key in self._entries if key == namespace or key.startswith(prefix)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def record(self, key, outcome):
+        with self._lock:
+            self._stats[key.split(':')[0]][outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'namespaces': {namespace: dict(counts) for namespace, counts in self._stats.items()}
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self.size -= entry[1]
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._entries:
+            _, (value, size, expires_at) = self._entries.popitem(last=False)
+            self.size -= size
+
+
+local_cache = LocalCache()
+
+_listener = None
+_listener_pid = None
+
+
+def _listen(client):
+    while True:
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Invalidations published before (re)subscribing were missed
+            local_cache.clear()
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if message:
+                    local_cache.invalidate(message['data'].decode())
+        except Exception as e:
+            redis_breaker.record_failure(e)
+            local_cache.clear()
+            time.sleep(redis_breaker.reset_timeout)
+
+
+def start_invalidation_listener(client):
+    """Subscribe this process to cross-worker invalidations; safe to call more than once.
+
+    The listener thread reconnects on its own, so it can be started while Redis is down.
+    Threads do not survive fork, so a forked child starts its own.
+    """
+    global _listener, _listener_pid
+    if _listener is None or _listener_pid != os.getpid():
+        local_cache.clear()
+        _listener = threading.Thread(target=_listen, args=(client,), name='cache-invalidation', daemon=True)
+        _listener.start()
+        _listener_pid = os.getpid()
+    return _listener
@@ -1,5 +1,5 @@
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.passwords import password_hasher
 from datetime import datetime
 
 class User(db.Model):
@@ -20,10 +20,13 @@ class User(db.Model):
     patient_profile = db.relationship('Patient', backref='user', uselist=False, cascade='all, delete-orphan')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
     def to_dict(self):
         return {
@@ -45,6 +48,7 @@ class Department(db.Model):
     name = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
     doctors = db.relationship('Doctor', backref='department', lazy='dynamic')
@@ -70,6 +74,8 @@ class Doctor(db.Model):
     experience_years = db.Column(db.Integer)
     consultation_fee = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Also bumped by hand when the doctor's user row changes, for incremental exports
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # Relationships
     availabilities = db.relationship('DoctorAvailability', backref='doctor', cascade='all, delete-orphan')
@@ -95,6 +101,9 @@ class Doctor(db.Model):
 
 class DoctorAvailability(db.Model):
     __tablename__ = 'doctor_availability'
+    __table_args__ = (
+        db.Index('ix_doctor_availability_doctor_date', 'doctor_id', 'date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), nullable=False)
@@ -150,6 +159,24 @@ class Patient(db.Model):
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # Slot conflict checks; the (doctor_id, appointment_date) prefix also serves the doctor dashboard
+        db.Index('ix_appointments_doctor_slot', 'doctor_id', 'appointment_date', 'appointment_time', 'status'),
+        # Patient dashboard and history
+        db.Index('ix_appointments_patient_status_date', 'patient_id', 'status', 'appointment_date'),
+        # Admin keyset pagination
+        db.Index('ix_appointments_date_id', 'appointment_date', 'id'),
+        # A doctor's slot can hold at most one booked appointment; enforced by the database
+        # so concurrent bookings cannot both succeed
+        db.Index(
+            'uq_appointments_booked_slot', 'doctor_id', 'appointment_date', 'appointment_time',
+            unique=True,
+            sqlite_where=db.text("status = 'booked'"),
+            postgresql_where=db.text("status = 'booked'")
+        ),
+        # Incremental warehouse exports
+        db.Index('ix_appointments_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
@@ -165,8 +192,8 @@ class Appointment(db.Model):
     # Relationships
     treatment = db.relationship('Treatment', backref='appointment', uselist=False, cascade='all, delete-orphan')
 
-    def to_dict(self):
-        return {
+    def to_dict(self, include_treatment=False):
+        data = {
             'id': self.id,
             'patient_id': self.patient_id,
             'patient_name': self.patient.user.full_name,
@@ -181,6 +208,9 @@ class Appointment(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+        if include_treatment and self.treatment:
+            data['treatment'] = self.treatment.to_dict()
+        return data
 
 
 class Treatment(db.Model):
@@ -193,7 +223,7 @@ class Treatment(db.Model):
     treatment_notes = db.Column(db.Text)
     next_visit_date = db.Column(db.Date)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     def to_dict(self):
         return {
@@ -206,3 +236,26 @@ class Treatment(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+class StatCounter(db.Model):
+    __tablename__ = 'stat_counters'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DoctorStats(db.Model):
+    __tablename__ = 'doctor_stats'
+
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctors.id'), primary_key=True)
+    total_patients = db.Column(db.Integer, nullable=False, default=0)
+    total_appointments = db.Column(db.Integer, nullable=False, default=0)
+    completed_appointments = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'total_patients': self.total_patients,
+            'total_appointments': self.total_appointments,
+            'completed_appointments': self.completed_appointments
+        }
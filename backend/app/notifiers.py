@@ -0,0 +1,54 @@
+from flask import current_app
+from datetime import datetime
+import json
+import threading
+
+
+class StdoutNotifier:
+    """Prints notifications; the stand-in used until a real channel is configured"""
+
+    name = 'stdout'
+
+    def __init__(self, app):
+        pass
+
+    def send(self, recipient, subject, message):
+        print(f"{subject.upper()}: {message}")
+
+
+class FileNotifier:
+    """Appends notifications as JSON lines to NOTIFIER_FILE, e.g. for local runs and audits"""
+
+    name = 'file'
+
+    def __init__(self, app):
+        self.path = app.config['NOTIFIER_FILE']
+        self._lock = threading.Lock()
+
+    def send(self, recipient, subject, message):
+        line = json.dumps({
+            'sent_at': datetime.utcnow().isoformat(),
+            'recipient': recipient,
+            'subject': subject,
+            'message': message
+        })
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+
+BACKENDS = {
+    'stdout': StdoutNotifier,
+    'file': FileNotifier,
+}
+
+
+def init_notifier(app):
+    """Pick the notifier backend named by NOTIFIER_BACKEND"""
+    backend = BACKENDS[app.config.get('NOTIFIER_BACKEND', 'stdout')](app)
+    app.extensions['notifier'] = backend
+    return backend
+
+
+def notifier():
+    """The notifier backend for the current app"""
+    return current_app.extensions['notifier']
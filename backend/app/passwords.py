@@ -0,0 +1,108 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import has_request_context
+from werkzeug.security import generate_password_hash, check_password_hash
+import multiprocessing
+import os
+import threading
+
+
+def _mp_context():
+    # Web workers run threads, and forking a threaded process can copy held locks;
+    # forkserver children start from a clean single-threaded server instead
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return None  # Windows: the default (spawn) is already safe
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['werkzeug.security'])
+    return context
+
+
+class HasherBusy(Exception):
+    """Raised when every hashing slot is taken; callers should answer 503"""
+
+
+class PasswordHasher:
+    """Runs password hashing in a small process pool so it never holds a web worker's GIL.
+
+    At most max_pending hashes are queued per web worker; beyond that callers
+    get HasherBusy after waiting wait_timeout seconds instead of piling up.
+    The pool starts on first use, and only hashing inside a request or an
+    explicit hash_many() uses it: startup, scripts, CLI commands and Celery
+    tasks otherwise hash inline and never start one. With workers=0
+    everything runs inline.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', workers=0, max_pending=8, wait_timeout=5):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._method_tag = None
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, method, workers, max_pending, wait_timeout):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._method_tag = None
+
+    def _executor(self, broken=None):
+        # Created lazily and per process, so a pool started before gunicorn forks is never reused,
+        # and replaced when a hashing process died and broke it
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid() or self._pool is broken:
+                if self._pool is not None and self._pool is broken:
+                    self._pool.shutdown(wait=False)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _in_pool(self, call):
+        """call(pool), retried once on a fresh pool if the current one is broken"""
+        pool = self._executor()
+        try:
+            return call(pool)
+        except BrokenProcessPool:
+            print("⚠ Password hashing pool broke, starting a new one")
+            return call(self._executor(broken=pool))
+
+    def _pooled(self):
+        return self.workers > 0 and has_request_context()
+
+    def _run(self, fn, *args):
+        if not self._pooled():
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise HasherBusy('Password hashing is overloaded, try again shortly')
+        try:
+            return self._in_pool(lambda pool: pool.submit(fn, *args).result())
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """Hash several passwords in parallel, e.g. for bulk user creation"""
+        if self.workers <= 0:
+            return [self.hash(password) for password in passwords]
+        return self._in_pool(lambda pool: list(pool.map(generate_password_hash, passwords, [self.method] * len(passwords))))
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Whether a hash was made with other parameters than the configured method"""
+        if self._method_tag is None:
+            # Werkzeug fills in default parameters ('pbkdf2:sha256' -> 'pbkdf2:sha256:600000'),
+            # so compare against the prefix of a real hash
+            self._method_tag = self.hash('').split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_tag
+
+
+password_hasher = PasswordHasher()
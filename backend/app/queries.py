@@ -0,0 +1,103 @@
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from app.models import Appointment, Doctor, Patient
+from datetime import date
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def appointment_query():
+    """Appointment query with patient, doctor, their users and treatment loaded in one round trip"""
+    return Appointment.query.options(
+        joinedload(Appointment.patient).joinedload(Patient.user),
+        joinedload(Appointment.doctor).joinedload(Doctor.user),
+        joinedload(Appointment.treatment)
+    )
+
+
+def doctor_query():
+    """Doctor query with user and department loaded in one round trip"""
+    return Doctor.query.options(
+        joinedload(Doctor.user),
+        joinedload(Doctor.department)
+    )
+
+
+def patient_query():
+    """Patient query with user loaded in one round trip"""
+    return Patient.query.options(joinedload(Patient.user))
+
+
+def serialize_appointments(appointments, include_treatment=False):
+    """Serialize appointments loaded through appointment_query()"""
+    return [appointment.to_dict(include_treatment=include_treatment) for appointment in appointments]
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row of a page as an opaque cursor"""
+    raw = json.dumps([value.isoformat() if isinstance(value, date) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, sort_columns):
+    """Decode a cursor back into sort key values; raises ValueError if malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(values, list) or len(values) != len(sort_columns):
+        raise ValueError('Invalid cursor')
+
+    decoded = []
+    for column, value in zip(sort_columns, values):
+        if column.type.python_type is date:
+            value = date.fromisoformat(value)
+        decoded.append(value)
+    return decoded
+
+
+def page_limit(limit):
+    """Clamp a requested page size to the allowed range"""
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def id_filter(value, name):
+    """Parse an optional integer id filter from the query string; raises ValueError"""
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'Invalid {name}')
+
+
+def paginate(query, sort_columns, cursor=None, limit=None, descending=False):
+    """Keyset-paginate query on sort_columns (the last column must be unique).
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    limit = page_limit(limit)
+
+    if cursor:
+        values = decode_cursor(cursor, sort_columns)
+        clauses = []
+        for i, column in enumerate(sort_columns):
+            compare = column < values[i] if descending else column > values[i]
+            clauses.append(and_(*[sort_columns[j] == values[j] for j in range(i)], compare))
+        query = query.filter(or_(*clauses))
+
+    order = [column.desc() if descending else column.asc() for column in sort_columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in sort_columns])
+
+    return rows, next_cursor
@@ -0,0 +1,42 @@
+from redis.exceptions import RedisError
+from app.redis_breaker import redis_breaker, get_redis
+import threading
+import time
+
+RATE_LIMIT_PREFIX = 'ratelimit:'
+
+# Fallback counters for when Redis is down; per process, so limits are looser then
+_local_windows = {}
+_local_lock = threading.Lock()
+
+
+def _hit_local(key, window):
+    now = time.monotonic()
+    with _local_lock:
+        if len(_local_windows) > 10000:
+            for stale in [k for k, (_, reset_at) in _local_windows.items() if reset_at <= now]:
+                del _local_windows[stale]
+        count, reset_at = _local_windows.get(key, (0, now + window))
+        if reset_at <= now:
+            count, reset_at = 0, now + window
+        _local_windows[key] = (count + 1, reset_at)
+        return count + 1, reset_at - now
+
+
+def hit(key, limit, window):
+    """Count one attempt against key in a fixed window; returns seconds to wait, or 0 if allowed"""
+    client = get_redis()
+    try:
+        if client:
+            pipe = client.pipeline(transaction=False)
+            pipe.set(RATE_LIMIT_PREFIX + key, 0, ex=window, nx=True)
+            pipe.incr(RATE_LIMIT_PREFIX + key)
+            pipe.ttl(RATE_LIMIT_PREFIX + key)
+            _, count, ttl = pipe.execute()
+            redis_breaker.record_success()
+            return max(ttl, 1) if count > limit else 0
+    except RedisError as e:
+        redis_breaker.record_failure(e)
+
+    count, remaining = _hit_local(key, window)
+    return max(int(remaining), 1) if count > limit else 0
@@ -0,0 +1,92 @@
+import threading
+import time
+import app
+
+
+class CircuitBreaker:
+    """Stops calling Redis after repeated failures and probes again after a cool-down.
+
+    closed: calls go through. open: calls are skipped until reset_timeout has
+    passed. half_open: a single trial call is let through; its outcome closes
+    or re-opens the circuit. A trial that never reports back is retried after
+    another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def configure(self, failure_threshold, reset_timeout):
+        with self._lock:
+            self.failure_threshold = failure_threshold
+            self.reset_timeout = reset_timeout
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def is_closed(self):
+        """Whether calls currently go through; unlike allow(), never takes the half-open trial"""
+        return self.state == 'closed'
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                print("✓ Redis reachable again, cache re-enabled")
+            self.state = 'closed'
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    print(f"⚠ Redis unavailable, cache calls short-circuited for {self.reset_timeout}s: {error}")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def trip(self, error):
+        """Open the circuit immediately, e.g. when the startup ping fails"""
+        with self._lock:
+            self.failures = max(self.failures, self.failure_threshold - 1)
+        self.record_failure(error)
+
+    def status(self):
+        with self._lock:
+            retry_in = None
+            if self.state == 'open':
+                retry_in = max(0.0, round(self.reset_timeout - (time.monotonic() - self.opened_at), 1))
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'last_error': self.last_error,
+                'retry_in_seconds': retry_in
+            }
+
+
+redis_breaker = CircuitBreaker()
+
+
+def get_redis():
+    """The shared Redis client, or None when Redis is not configured or the circuit is open"""
+    if app.redis_client is None or not redis_breaker.allow():
+        return None
+    return app.redis_client
+
+
+def redis_available():
+    """Whether Redis is configured and healthy, without probing it"""
+    return app.redis_client is not None and redis_breaker.is_closed()
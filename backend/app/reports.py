@@ -0,0 +1,106 @@
+from flask import current_app
+from sqlalchemy import func, case, distinct
+from app import db
+from app.models import User, Doctor, Patient, Appointment, Treatment
+from app.queries import doctor_query
+from datetime import date, datetime, timedelta
+from itertools import groupby
+import os
+
+ROW_CHUNK_SIZE = 1000
+
+
+def previous_month():
+    """'YYYY-MM' of the month before today"""
+    return (date.today().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+
+
+def month_range(month):
+    """First and last day of a 'YYYY-MM' month; raises ValueError"""
+    first = datetime.strptime(month, '%Y-%m').date()
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first, last
+
+
+def doctor_month_stats(doctor_ids, first, last):
+    """Per-doctor appointment totals for a date range, in one grouped query"""
+    rows = db.session.query(
+        Appointment.doctor_id,
+        func.count(Appointment.id),
+        func.sum(case((Appointment.status == 'completed', 1), else_=0)),
+        func.sum(case((Appointment.status == 'cancelled', 1), else_=0)),
+        func.count(distinct(Appointment.patient_id))
+    ).filter(
+        Appointment.doctor_id.in_(doctor_ids),
+        Appointment.appointment_date >= first,
+        Appointment.appointment_date <= last
+    ).group_by(Appointment.doctor_id).all()
+
+    stats = {doctor_id: {'total': 0, 'completed': 0, 'cancelled': 0, 'patients': 0} for doctor_id in doctor_ids}
+    for doctor_id, total, completed, cancelled, patients in rows:
+        stats[doctor_id] = {
+            'total': total,
+            'completed': completed or 0,
+            'cancelled': cancelled or 0,
+            'patients': patients
+        }
+    return stats
+
+
+def treatment_rows(doctor_ids, first, last):
+    """Completed, treated appointments of several doctors, streamed in (doctor_id, date) order"""
+    return db.session.query(
+        Appointment.doctor_id,
+        Appointment.appointment_date,
+        User.full_name.label('patient_name'),
+        Treatment.diagnosis,
+        Treatment.prescription
+    ).join(Treatment, Treatment.appointment_id == Appointment.id).join(
+        Patient, Patient.id == Appointment.patient_id
+    ).join(
+        User, User.id == Patient.user_id
+    ).filter(
+        Appointment.doctor_id.in_(doctor_ids),
+        Appointment.appointment_date >= first,
+        Appointment.appointment_date <= last,
+        Appointment.status == 'completed'
+    ).order_by(Appointment.doctor_id, Appointment.appointment_date, Appointment.id).yield_per(ROW_CHUNK_SIZE)
+
+
+def write_monthly_reports(doctor_ids, month):
+    """Render the month's report for each doctor to REPORTS_DIR/<month>/; returns [(doctor, path)].
+
+    Uses one query for the doctors, one for their totals and one streamed
+    query for all table rows; each file is written as the template renders.
+    """
+    first, last = month_range(month)
+    period = first.strftime('%B %Y')
+    directory = os.path.join(current_app.config['REPORTS_DIR'], month)
+    os.makedirs(directory, exist_ok=True)
+
+    template = current_app.jinja_env.get_template('monthly_report.html')
+
+    doctors = doctor_query().filter(Doctor.id.in_(doctor_ids)).order_by(Doctor.id).all()
+    stats = doctor_month_stats(doctor_ids, first, last)
+    row_groups = groupby(treatment_rows(doctor_ids, first, last), key=lambda row: row.doctor_id)
+
+    reports = []
+    group = next(row_groups, None)
+    for doctor in doctors:
+        while group and group[0] < doctor.id:
+            group = next(row_groups, None)
+        has_rows = group is not None and group[0] == doctor.id
+
+        path = os.path.join(directory, f'doctor_{doctor.id}.html')
+        template.stream(
+            doctor=doctor,
+            period=period,
+            stats=stats[doctor.id],
+            rows=group[1] if has_rows else ()
+        ).dump(path, encoding='utf-8')
+        reports.append((doctor, path))
+
+        if has_rows:
+            group = next(row_groups, None)
+
+    return reports
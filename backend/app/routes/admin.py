@@ -1,41 +1,33 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app import db
 from app.models import User, Doctor, Patient, Appointment, Department
-from app.utils import role_required, cache_get, cache_set, cache_delete, cache_clear_pattern
+from app.utils import role_required, cache_get_or_compute, cache_invalidate, cache_purge_pattern, cache_stats, invalidate_doctor_dashboard, invalidate_principal
+from app.queries import appointment_query, doctor_query, patient_query, serialize_appointments, paginate, id_filter
+from app.search import search_backend
+from app.counters import aggregate_dashboard, read_counters, counters_enabled, bump
+from app.warehouse import warehouse_available, read_manifest
+from app.tasks import export_warehouse
 from datetime import datetime
 
 bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
+# Dashboard counts are fresh for a minute, then served stale while one request recomputes
+DASHBOARD_SOFT_TTL = 60
+DASHBOARD_HARD_TTL = 300
+
 @bp.route('/dashboard', methods=['GET'])
 @role_required('admin')
 def dashboard():
     """Get admin dashboard statistics"""
-    cache_key = 'admin:dashboard'
-    cached_data = cache_get(cache_key)
-
-    if cached_data:
-        return jsonify(cached_data), 200
+    def compute():
+        # Maintained counters are an O(1) read; otherwise one grouped aggregate query
+        return read_counters() if counters_enabled() else aggregate_dashboard()
 
     try:
-        total_doctors = Doctor.query.join(User).filter(User.is_active == True).count()
-        total_patients = Patient.query.join(User).filter(User.is_active == True).count()
-        total_appointments = Appointment.query.count()
-        pending_appointments = Appointment.query.filter_by(status='booked').count()
-        completed_appointments = Appointment.query.filter_by(status='completed').count()
-        cancelled_appointments = Appointment.query.filter_by(status='cancelled').count()
-
-        data = {
-            'total_doctors': total_doctors,
-            'total_patients': total_patients,
-            'total_appointments': total_appointments,
-            'pending_appointments': pending_appointments,
-            'completed_appointments': completed_appointments,
-            'cancelled_appointments': cancelled_appointments
-        }
-
-        # Cache for 5 minutes
-        cache_set(cache_key, data, 300)
-
+        data = cache_get_or_compute(
+            'admin:dashboard', compute,
+            soft_ttl=DASHBOARD_SOFT_TTL, hard_ttl=DASHBOARD_HARD_TTL
+        )
         return jsonify(data), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -65,7 +57,7 @@ def manage_departments():
             db.session.add(department)
             db.session.commit()
 
-            cache_clear_pattern('departments:*')
+            cache_invalidate('departments')
 
             return jsonify({
                 'message': 'Department created successfully',
@@ -79,24 +71,29 @@ def manage_departments():
 @bp.route('/doctors', methods=['GET'])
 @role_required('admin')
 def get_doctors():
-    """Get all doctors"""
+    """Get doctors, one keyset page at a time"""
     try:
         search = request.args.get('search', '')
-        department_id = request.args.get('department_id')
+        department_id = id_filter(request.args.get('department_id'), 'department_id')
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', type=int)
 
-        query = Doctor.query.join(User)
+        query = doctor_query().join(User)
 
         if search:
-            query = query.filter(
-                (User.full_name.ilike(f'%{search}%')) |
-                (Doctor.specialization.ilike(f'%{search}%'))
-            )
+            matches = search_backend().doctor_matches(search).subquery()
+            query = query.join(matches, matches.c.id == Doctor.id)
 
         if department_id:
             query = query.filter(Doctor.department_id == department_id)
 
-        doctors = query.all()
-        return jsonify([doctor.to_dict() for doctor in doctors]), 200
+        doctors, next_cursor = paginate(query, [Doctor.id], cursor, limit)
+        return jsonify({
+            'items': [doctor.to_dict() for doctor in doctors],
+            'next_cursor': next_cursor
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -140,10 +137,13 @@ def create_doctor():
             consultation_fee=data.get('consultation_fee')
         )
         db.session.add(doctor)
+        db.session.flush()
+        search_backend().index_doctor(doctor)
+        bump('total_doctors')
         db.session.commit()
 
-        cache_clear_pattern('admin:*')
-        cache_clear_pattern('doctors:*')
+        cache_invalidate('admin')
+        cache_invalidate('doctors')
 
         return jsonify({
             'message': 'Doctor created successfully',
@@ -171,6 +171,8 @@ def manage_doctor(doctor_id):
             # Update user info
             if 'full_name' in data:
                 doctor.user.full_name = data['full_name']
+                # The name is exported with the doctor row, but lives on the user
+                doctor.updated_at = datetime.utcnow()
             if 'email' in data:
                 doctor.user.email = data['email']
             if 'phone' in data:
@@ -188,10 +190,12 @@ def manage_doctor(doctor_id):
             if 'consultation_fee' in data:
                 doctor.consultation_fee = data['consultation_fee']
 
+            search_backend().index_doctor(doctor)
             db.session.commit()
 
-            cache_clear_pattern('admin:*')
-            cache_clear_pattern('doctors:*')
+            cache_invalidate('admin')
+            cache_invalidate('doctors')
+            invalidate_doctor_dashboard(doctor.id)
 
             return jsonify({
                 'message': 'Doctor updated successfully',
@@ -203,11 +207,16 @@ def manage_doctor(doctor_id):
 
     elif request.method == 'DELETE':
         try:
+            if doctor.user.is_active:
+                bump('total_doctors', -1)
             doctor.user.is_active = False
+            doctor.updated_at = datetime.utcnow()
             db.session.commit()
 
-            cache_clear_pattern('admin:*')
-            cache_clear_pattern('doctors:*')
+            invalidate_principal(doctor.user_id)
+            cache_invalidate('admin')
+            cache_invalidate('doctors')
+            invalidate_doctor_dashboard(doctor.id)
 
             return jsonify({'message': 'Doctor deactivated successfully'}), 200
         except Exception as e:
@@ -218,21 +227,25 @@ def manage_doctor(doctor_id):
 @bp.route('/patients', methods=['GET'])
 @role_required('admin')
 def get_patients():
-    """Get all patients"""
+    """Get patients, one keyset page at a time"""
     try:
         search = request.args.get('search', '')
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', type=int)
 
-        query = Patient.query.join(User)
+        query = patient_query().join(User)
 
         if search:
-            query = query.filter(
-                (User.full_name.ilike(f'%{search}%')) |
-                (User.email.ilike(f'%{search}%')) |
-                (User.phone.ilike(f'%{search}%'))
-            )
+            matches = search_backend().patient_matches(search).subquery()
+            query = query.join(matches, matches.c.id == Patient.id)
 
-        patients = query.all()
-        return jsonify([patient.to_dict() for patient in patients]), 200
+        patients, next_cursor = paginate(query, [Patient.id], cursor, limit)
+        return jsonify({
+            'items': [patient.to_dict() for patient in patients],
+            'next_cursor': next_cursor
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -273,9 +286,11 @@ def manage_patient(patient_id):
             if 'medical_history' in data:
                 patient.medical_history = data['medical_history']
 
+            search_backend().index_patient(patient)
             db.session.commit()
 
-            cache_clear_pattern('admin:*')
+            cache_invalidate('admin')
+            cache_invalidate(f'patient:{patient.id}')
 
             return jsonify({
                 'message': 'Patient updated successfully',
@@ -287,10 +302,14 @@ def manage_patient(patient_id):
 
     elif request.method == 'DELETE':
         try:
+            if patient.user.is_active:
+                bump('total_patients', -1)
             patient.user.is_active = False
             db.session.commit()
 
-            cache_clear_pattern('admin:*')
+            invalidate_principal(patient.user_id)
+            cache_invalidate('admin')
+            cache_invalidate(f'patient:{patient.id}')
 
             return jsonify({'message': 'Patient deactivated successfully'}), 200
         except Exception as e:
@@ -301,16 +320,108 @@ def manage_patient(patient_id):
 @bp.route('/appointments', methods=['GET'])
 @role_required('admin')
 def get_all_appointments():
-    """Get all appointments"""
+    """Get appointments newest first, one keyset page at a time"""
     try:
         status = request.args.get('status')
+        doctor_id = id_filter(request.args.get('doctor_id'), 'doctor_id')
+        patient_id = id_filter(request.args.get('patient_id'), 'patient_id')
+        date_from = request.args.get('date_from')
+        date_to = request.args.get('date_to')
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', type=int)
 
-        query = Appointment.query
+        query = appointment_query()
 
         if status:
-            query = query.filter_by(status=status)
+            query = query.filter(Appointment.status == status)
+
+        if doctor_id:
+            query = query.filter(Appointment.doctor_id == doctor_id)
+
+        if patient_id:
+            query = query.filter(Appointment.patient_id == patient_id)
+
+        if date_from:
+            query = query.filter(Appointment.appointment_date >= datetime.strptime(date_from, '%Y-%m-%d').date())
+
+        if date_to:
+            query = query.filter(Appointment.appointment_date <= datetime.strptime(date_to, '%Y-%m-%d').date())
+
+        appointments, next_cursor = paginate(
+            query, [Appointment.appointment_date, Appointment.id], cursor, limit, descending=True
+        )
+        return jsonify({
+            'items': serialize_appointments(appointments),
+            'next_cursor': next_cursor
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        appointments = query.order_by(Appointment.appointment_date.desc()).all()
-        return jsonify([appointment.to_dict() for appointment in appointments]), 200
+# Warehouse Export
+@bp.route('/exports/warehouse', methods=['GET', 'POST'])
+@role_required('admin')
+def warehouse_export():
+    """Start a Parquet export of appointments, treatments, doctors and departments, or show the last one"""
+    if request.method == 'GET':
+        return jsonify(read_manifest(current_app.config['WAREHOUSE_DIR'])), 200
+
+    if not warehouse_available():
+        return jsonify({'error': 'Warehouse export requires pyarrow'}), 503
+
+    try:
+        # {"full": true} rewrites every table instead of exporting rows changed since the last run
+        full = bool((request.get_json(silent=True) or {}).get('full'))
+        task = export_warehouse.delay(full)
+
+        return jsonify({
+            'message': 'Warehouse export started',
+            'task_id': task.id
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/exports/warehouse/<task_id>', methods=['GET'])
+@role_required('admin')
+def warehouse_export_status(task_id):
+    """Check the status of a warehouse export task"""
+    try:
+        task = export_warehouse.AsyncResult(task_id)
+
+        if task.state == 'PENDING':
+            response = {'status': 'pending'}
+        elif task.state == 'PROGRESS':
+            response = {'status': 'in_progress', **task.info}
+        elif task.state == 'SUCCESS':
+            response = {'status': 'completed', 'result': task.result}
+        elif task.state == 'FAILURE':
+            response = {'status': 'failed', 'error': str(task.info)}
+        else:
+            response = {'status': task.state}
+
+        return jsonify(response), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+# Cache Maintenance
+@bp.route('/cache/purge', methods=['POST'])
+@role_required('admin')
+def purge_cache():
+    """Physically delete cache keys matching a pattern (SCAN-based; maintenance only)"""
+    data = request.get_json(silent=True) or {}
+    pattern = data.get('pattern')
+    if not pattern:
+        return jsonify({'error': 'pattern is required, e.g. "doctors:*"'}), 400
+
+    try:
+        deleted = cache_purge_pattern(pattern)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'message': 'Cache purged', 'pattern': pattern, 'deleted': deleted}), 200
+
+@bp.route('/cache/stats', methods=['GET'])
+@role_required('admin')
+def get_cache_stats():
+    """In-process cache usage and hit/miss counts per key namespace for the serving worker"""
+    return jsonify(cache_stats()), 200
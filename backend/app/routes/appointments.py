@@ -1,17 +1,23 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models import Appointment, Patient, Doctor
-from app.utils import role_required, get_current_user, cache_clear_pattern
+from app.utils import role_required, current_principal, current_patient, cache_invalidate, invalidate_doctor_dashboard
+from app.counters import record_new_appointment, record_status_change
+from app.availability import slot_grid, serialize_grid, is_slot_on_grid, parse_range, slot_minutes
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
 
+SLOT_TAKEN_ERROR = 'This time slot is already booked. Please choose another time.'
+MAX_BATCH_DOCTORS = 100
+OFF_GRID_ERROR = 'The doctor is not available at this time. Please choose one of the listed slots.'
+
 bp = Blueprint('appointments', __name__, url_prefix='/api/appointments')
 
 @bp.route('', methods=['POST'])
 @role_required('patient')
 def book_appointment():
     """Book a new appointment"""
-    user = get_current_user()
-    patient = user.patient_profile
+    patient = current_patient()
 
     if not patient:
         return jsonify({'error': 'Patient profile not found'}), 404
@@ -33,20 +39,10 @@ def book_appointment():
         appointment_date = datetime.strptime(data['appointment_date'], '%Y-%m-%d').date()
         appointment_time = datetime.strptime(data['appointment_time'], '%H:%M').time()
 
-        # Check for conflicts - prevent double booking for same doctor at same time
-        existing = Appointment.query.filter(
-            Appointment.doctor_id == data['doctor_id'],
-            Appointment.appointment_date == appointment_date,
-            Appointment.appointment_time == appointment_time,
-            Appointment.status == 'booked'
-        ).first()
-
-        if existing:
-            return jsonify({
-                'error': 'This time slot is already booked. Please choose another time.'
-            }), 409
+        if not is_slot_on_grid(doctor.id, appointment_date, appointment_time):
+            return jsonify({'error': OFF_GRID_ERROR}), 400
 
-        # Create appointment
+        # Create appointment - double booking is rejected by the uq_appointments_booked_slot index
         appointment = Appointment(
             patient_id=patient.id,
             doctor_id=data['doctor_id'],
@@ -57,13 +53,15 @@ def book_appointment():
             status='booked'
         )
 
+        record_new_appointment(appointment)
         db.session.add(appointment)
         db.session.commit()
 
         # Clear relevant caches
-        cache_clear_pattern('appointments:*')
-        cache_clear_pattern(f'patient:{patient.id}:*')
-        cache_clear_pattern('admin:*')
+        cache_invalidate('appointments')
+        cache_invalidate(f'patient:{patient.id}')
+        cache_invalidate('admin')
+        invalidate_doctor_dashboard(appointment.doctor_id)
 
         return jsonify({
             'message': 'Appointment booked successfully',
@@ -72,6 +70,9 @@ def book_appointment():
 
     except ValueError as e:
         return jsonify({'error': 'Invalid date or time format'}), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': SLOT_TAKEN_ERROR}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -80,32 +81,27 @@ def book_appointment():
 @role_required('patient', 'doctor', 'admin')
 def get_appointment(appointment_id):
     """Get appointment details"""
-    user = get_current_user()
+    principal = current_principal()
     appointment = Appointment.query.get(appointment_id)
 
     if not appointment:
         return jsonify({'error': 'Appointment not found'}), 404
 
     # Check authorization
-    if user.role == 'patient':
-        if appointment.patient.user_id != user.id:
+    if principal['role'] == 'patient':
+        if appointment.patient_id != principal['profile_id']:
             return jsonify({'error': 'Unauthorized'}), 403
-    elif user.role == 'doctor':
-        if appointment.doctor.user_id != user.id:
+    elif principal['role'] == 'doctor':
+        if appointment.doctor_id != principal['profile_id']:
             return jsonify({'error': 'Unauthorized'}), 403
 
-    app_data = appointment.to_dict()
-    if appointment.treatment:
-        app_data['treatment'] = appointment.treatment.to_dict()
-
-    return jsonify(app_data), 200
+    return jsonify(appointment.to_dict(include_treatment=True)), 200
 
 @bp.route('/<int:appointment_id>', methods=['PUT'])
 @role_required('patient')
 def reschedule_appointment(appointment_id):
     """Reschedule an appointment"""
-    user = get_current_user()
-    patient = user.patient_profile
+    patient = current_patient()
 
     appointment = Appointment.query.get(appointment_id)
 
@@ -132,21 +128,11 @@ def reschedule_appointment(appointment_id):
         else:
             new_time = appointment.appointment_time
 
-        # Check for conflicts
-        existing = Appointment.query.filter(
-            Appointment.id != appointment_id,
-            Appointment.doctor_id == appointment.doctor_id,
-            Appointment.appointment_date == new_date,
-            Appointment.appointment_time == new_time,
-            Appointment.status == 'booked'
-        ).first()
-
-        if existing:
-            return jsonify({
-                'error': 'This time slot is already booked. Please choose another time.'
-            }), 409
-
-        # Update appointment
+        if (new_date, new_time) != (appointment.appointment_date, appointment.appointment_time):
+            if not is_slot_on_grid(appointment.doctor_id, new_date, new_time):
+                return jsonify({'error': OFF_GRID_ERROR}), 400
+
+        # Update appointment - conflicts are rejected by the uq_appointments_booked_slot index
         appointment.appointment_date = new_date
         appointment.appointment_time = new_time
 
@@ -158,8 +144,9 @@ def reschedule_appointment(appointment_id):
         db.session.commit()
 
         # Clear caches
-        cache_clear_pattern('appointments:*')
-        cache_clear_pattern(f'patient:{patient.id}:*')
+        cache_invalidate('appointments')
+        cache_invalidate(f'patient:{patient.id}')
+        invalidate_doctor_dashboard(appointment.doctor_id)
 
         return jsonify({
             'message': 'Appointment rescheduled successfully',
@@ -168,6 +155,9 @@ def reschedule_appointment(appointment_id):
 
     except ValueError as e:
         return jsonify({'error': 'Invalid date or time format'}), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': SLOT_TAKEN_ERROR}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -176,8 +166,7 @@ def reschedule_appointment(appointment_id):
 @role_required('patient')
 def cancel_appointment(appointment_id):
     """Cancel an appointment"""
-    user = get_current_user()
-    patient = user.patient_profile
+    patient = current_patient()
 
     appointment = Appointment.query.get(appointment_id)
 
@@ -191,13 +180,15 @@ def cancel_appointment(appointment_id):
         return jsonify({'error': 'Can only cancel booked appointments'}), 400
 
     try:
+        record_status_change(appointment, 'cancelled')
         appointment.status = 'cancelled'
         db.session.commit()
 
         # Clear caches
-        cache_clear_pattern('appointments:*')
-        cache_clear_pattern(f'patient:{patient.id}:*')
-        cache_clear_pattern('admin:*')
+        cache_invalidate('appointments')
+        cache_invalidate(f'patient:{patient.id}')
+        cache_invalidate('admin')
+        invalidate_doctor_dashboard(appointment.doctor_id)
 
         return jsonify({
             'message': 'Appointment cancelled successfully',
@@ -223,18 +214,65 @@ def check_availability():
         appointment_date = datetime.strptime(data['appointment_date'], '%Y-%m-%d').date()
         appointment_time = datetime.strptime(data['appointment_time'], '%H:%M').time()
 
-        existing = Appointment.query.filter(
-            Appointment.doctor_id == data['doctor_id'],
-            Appointment.appointment_date == appointment_date,
-            Appointment.appointment_time == appointment_time,
-            Appointment.status == 'booked'
-        ).first()
+        doctor_id = int(data['doctor_id'])
+
+        grid = slot_grid([doctor_id], appointment_date, appointment_date)
+        free_slots = grid[doctor_id].get(appointment_date, [])
 
         return jsonify({
-            'available': existing is None
+            'available': appointment_time in free_slots
         }), 200
 
     except ValueError:
-        return jsonify({'error': 'Invalid date or time format'}), 400
+        return jsonify({'error': 'Invalid doctor, date or time format'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/slots', methods=['GET'])
+@role_required('patient', 'admin')
+def get_slots():
+    """Get a doctor's free slot grid over a date range (defaults to the next 7 days)"""
+    doctor_id = request.args.get('doctor_id', type=int)
+    if not doctor_id:
+        return jsonify({'error': 'Missing required field: doctor_id'}), 400
+
+    try:
+        date_from, date_to = parse_range(request.args.get('date_from'), request.args.get('date_to'))
+        grid = slot_grid([doctor_id], date_from, date_to)
+
+        return jsonify({
+            'doctor_id': doctor_id,
+            'slot_minutes': slot_minutes(),
+            'slots': serialize_grid(grid)[str(doctor_id)]
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/slots/batch', methods=['POST'])
+@role_required('patient', 'admin')
+def get_slots_batch():
+    """Get free slot grids for many doctors at once"""
+    data = request.get_json()
+
+    doctor_ids = data.get('doctor_ids')
+    if not doctor_ids or not isinstance(doctor_ids, list):
+        return jsonify({'error': 'doctor_ids must be a non-empty list'}), 400
+
+    if len(doctor_ids) > MAX_BATCH_DOCTORS:
+        return jsonify({'error': f'At most {MAX_BATCH_DOCTORS} doctors per request'}), 400
+
+    try:
+        doctor_ids = [int(doctor_id) for doctor_id in doctor_ids]
+        date_from, date_to = parse_range(data.get('date_from'), data.get('date_to'))
+        grid = slot_grid(doctor_ids, date_from, date_to)
+
+        return jsonify({
+            'slot_minutes': slot_minutes(),
+            'doctors': serialize_grid(grid)
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
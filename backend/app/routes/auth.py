@@ -1,7 +1,11 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, g, current_app
 from app import db
 from app.models import User, Patient, Doctor
-from app.utils import login_required, get_current_user
+from app.utils import login_required, get_current_user, load_principal
+from app.ratelimit import hit
+from app.tokens import token_auth_enabled, issue_tokens, verify_token, is_revoked, revoke_token, REFRESH
+from app.search import search_backend
+from app.counters import bump
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -46,6 +50,9 @@ def register():
             emergency_contact=data.get('emergency_contact')
         )
         db.session.add(patient)
+        db.session.flush()
+        search_backend().index_patient(patient)
+        bump('total_patients')
         db.session.commit()
 
         return jsonify({
@@ -65,6 +72,15 @@ def login():
     if not data.get('username') or not data.get('password'):
         return jsonify({'error': 'Username and password required'}), 400
 
+    # Every attempt costs a password hash, so throttle per client and per account
+    window = current_app.config['LOGIN_RATE_WINDOW']
+    retry_after = max(
+        hit(f'login:ip:{request.remote_addr}', current_app.config['LOGIN_IP_RATE_LIMIT'], window),
+        hit(f'login:user:{data["username"].lower()}', current_app.config['LOGIN_RATE_LIMIT'], window)
+    )
+    if retry_after:
+        return jsonify({'error': 'Too many login attempts, try again later'}), 429, {'Retry-After': str(retry_after)}
+
     user = User.query.filter_by(username=data['username']).first()
 
     if not user or not user.check_password(data['password']):
@@ -73,15 +89,23 @@ def login():
     if not user.is_active:
         return jsonify({'error': 'Account is inactive'}), 403
 
-    # Set session
-    session['user_id'] = user.id
-    session['role'] = user.role
+    # Upgrade hashes made with older work-factor settings while the password is at hand
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        db.session.commit()
 
     response_data = {
         'message': 'Login successful',
         'user': user.to_dict()
     }
 
+    if token_auth_enabled():
+        response_data.update(issue_tokens(load_principal(user.id)))
+    else:
+        # Set session
+        session['user_id'] = user.id
+        session['role'] = user.role
+
     # Add profile data based on role
     if user.role == 'doctor' and user.doctor_profile:
         response_data['profile'] = user.doctor_profile.to_dict()
@@ -94,9 +118,44 @@ def login():
 @login_required
 def logout():
     """Logout current user"""
+    if token_auth_enabled():
+        revoked = revoke_token(g.token_claims)
+        refresh_claims = verify_token((request.get_json(silent=True) or {}).get('refresh_token') or '', REFRESH)
+        if refresh_claims and refresh_claims['sub'] == g.token_claims['sub']:
+            revoked = revoke_token(refresh_claims) and revoked
+        if not revoked:
+            # The tokens would keep working until they expire
+            return jsonify({'error': 'Logout is temporarily unavailable, try again'}), 503, {'Retry-After': '5'}
     session.clear()
     return jsonify({'message': 'Logged out successfully'}), 200
 
+@bp.route('/refresh', methods=['POST'])
+def refresh():
+    """Exchange a refresh token for a new token pair (token auth mode only)"""
+    if not token_auth_enabled():
+        return jsonify({'error': 'Token authentication is not enabled'}), 400
+
+    data = request.get_json(silent=True) or {}
+    claims = verify_token(data.get('refresh_token') or '', REFRESH)
+    if claims is None:
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+
+    # Refresh tokens are single use, which cannot be enforced while Redis is unreachable
+    revoked = is_revoked(claims)
+    if revoked is None:
+        return jsonify({'error': 'Token refresh is temporarily unavailable'}), 503, {'Retry-After': '5'}
+    if revoked:
+        return jsonify({'error': 'Invalid or expired refresh token'}), 401
+
+    # Refreshing re-reads the user, so role changes and deactivation are picked up here
+    principal = load_principal(claims['sub'])
+    if not principal or not principal['is_active']:
+        return jsonify({'error': 'Account is inactive'}), 403
+
+    if not revoke_token(claims):
+        return jsonify({'error': 'Token refresh is temporarily unavailable'}), 503, {'Retry-After': '5'}
+    return jsonify(issue_tokens(principal)), 200
+
 @bp.route('/me', methods=['GET'])
 @login_required
 def get_me():
@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models import Doctor, Appointment, Treatment, DoctorAvailability
-from app.utils import role_required, get_current_user, cache_clear_pattern
+from app.utils import role_required, current_doctor, cache_get, cache_set, cache_invalidate, doctor_dashboard_key, invalidate_doctor_dashboard
+from app.queries import appointment_query, serialize_appointments
+from app.counters import record_status_change, doctor_stats
+from app.routing import primary_reads
 from datetime import datetime, timedelta, date
 
 bp = Blueprint('doctor', __name__, url_prefix='/api/doctor')
@@ -10,47 +13,50 @@ bp = Blueprint('doctor', __name__, url_prefix='/api/doctor')
 @role_required('doctor')
 def dashboard():
     """Get doctor dashboard data"""
-    user = get_current_user()
-    doctor = user.doctor_profile
+    doctor = current_doctor()
 
     if not doctor:
         return jsonify({'error': 'Doctor profile not found'}), 404
 
+    cache_key = doctor_dashboard_key(doctor.id)
+    cached_data = cache_get(cache_key)
+
+    if cached_data:
+        return jsonify(cached_data), 200
+
     try:
-        # Get upcoming appointments for the next 7 days
-        today = date.today()
-        next_week = today + timedelta(days=7)
+        # Built on the primary: a lagging replica would be cached for the full TTL
+        with primary_reads():
+            # Running totals are maintained on every booking and status change. Read them
+            # first: building a missing row commits, which would expire the lists below
+            stats = doctor_stats(doctor.id)
 
-        upcoming_appointments = Appointment.query.filter(
-            Appointment.doctor_id == doctor.id,
-            Appointment.appointment_date >= today,
-            Appointment.appointment_date <= next_week,
-            Appointment.status == 'booked'
-        ).order_by(Appointment.appointment_date, Appointment.appointment_time).all()
+            # Get upcoming appointments for the next 7 days
+            today = date.today()
+            next_week = today + timedelta(days=7)
 
-        # Get today's appointments
-        today_appointments = Appointment.query.filter(
-            Appointment.doctor_id == doctor.id,
-            Appointment.appointment_date == today
-        ).all()
-
-        # Get patients assigned to doctor
-        patients = db.session.query(Appointment.patient_id).filter(
-            Appointment.doctor_id == doctor.id
-        ).distinct().count()
-
-        # Get statistics
-        total_appointments = Appointment.query.filter_by(doctor_id=doctor.id).count()
-        completed = Appointment.query.filter_by(doctor_id=doctor.id, status='completed').count()
-
-        data = {
-            'doctor': doctor.to_dict(),
-            'upcoming_appointments': [app.to_dict() for app in upcoming_appointments],
-            'today_appointments': [app.to_dict() for app in today_appointments],
-            'total_patients': patients,
-            'total_appointments': total_appointments,
-            'completed_appointments': completed
-        }
+            upcoming_appointments = appointment_query().filter(
+                Appointment.doctor_id == doctor.id,
+                Appointment.appointment_date >= today,
+                Appointment.appointment_date <= next_week,
+                Appointment.status == 'booked'
+            ).order_by(Appointment.appointment_date, Appointment.appointment_time).all()
+
+            # Get today's appointments
+            today_appointments = appointment_query().filter(
+                Appointment.doctor_id == doctor.id,
+                Appointment.appointment_date == today
+            ).all()
+
+            data = {
+                'doctor': doctor.to_dict(),
+                'upcoming_appointments': serialize_appointments(upcoming_appointments),
+                'today_appointments': serialize_appointments(today_appointments),
+                **stats.to_dict()
+            }
+
+        # Cache for 5 minutes; writes touching this doctor invalidate it
+        cache_set(cache_key, data, 300)
 
         return jsonify(data), 200
     except Exception as e:
@@ -60,15 +66,14 @@ def dashboard():
 @role_required('doctor')
 def get_appointments():
     """Get doctor's appointments"""
-    user = get_current_user()
-    doctor = user.doctor_profile
+    doctor = current_doctor()
 
     try:
         status = request.args.get('status')
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
 
-        query = Appointment.query.filter_by(doctor_id=doctor.id)
+        query = appointment_query().filter_by(doctor_id=doctor.id)
 
         if status:
             query = query.filter_by(status=status)
@@ -80,7 +85,7 @@ def get_appointments():
             query = query.filter(Appointment.appointment_date <= datetime.strptime(date_to, '%Y-%m-%d').date())
 
         appointments = query.order_by(Appointment.appointment_date.desc()).all()
-        return jsonify([app.to_dict() for app in appointments]), 200
+        return jsonify(serialize_appointments(appointments)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -88,8 +93,7 @@ def get_appointments():
 @role_required('doctor')
 def complete_appointment(appointment_id):
     """Mark appointment as completed and add treatment"""
-    user = get_current_user()
-    doctor = user.doctor_profile
+    doctor = current_doctor()
 
     appointment = Appointment.query.get(appointment_id)
 
@@ -106,6 +110,7 @@ def complete_appointment(appointment_id):
 
     try:
         # Update appointment status
+        record_status_change(appointment, 'completed')
         appointment.status = 'completed'
 
         # Create or update treatment
@@ -128,8 +133,10 @@ def complete_appointment(appointment_id):
 
         db.session.commit()
 
-        cache_clear_pattern('appointments:*')
-        cache_clear_pattern('patient:*')
+        cache_invalidate('appointments')
+        cache_invalidate('admin')
+        cache_invalidate(f'patient:{appointment.patient_id}')
+        invalidate_doctor_dashboard(doctor.id)
 
         return jsonify({
             'message': 'Appointment completed successfully',
@@ -144,8 +151,7 @@ def complete_appointment(appointment_id):
 @role_required('doctor')
 def cancel_appointment(appointment_id):
     """Cancel an appointment"""
-    user = get_current_user()
-    doctor = user.doctor_profile
+    doctor = current_doctor()
 
     appointment = Appointment.query.get(appointment_id)
 
@@ -156,10 +162,14 @@ def cancel_appointment(appointment_id):
         return jsonify({'error': 'Unauthorized'}), 403
 
     try:
+        record_status_change(appointment, 'cancelled')
         appointment.status = 'cancelled'
         db.session.commit()
 
-        cache_clear_pattern('appointments:*')
+        cache_invalidate('appointments')
+        cache_invalidate('admin')
+        cache_invalidate(f'patient:{appointment.patient_id}')
+        invalidate_doctor_dashboard(doctor.id)
 
         return jsonify({
             'message': 'Appointment cancelled successfully',
@@ -173,25 +183,17 @@ def cancel_appointment(appointment_id):
 @role_required('doctor')
 def get_patient_history(patient_id):
     """Get patient's treatment history"""
-    user = get_current_user()
-    doctor = user.doctor_profile
+    doctor = current_doctor()
 
     try:
         # Get all completed appointments for this patient with this doctor
-        appointments = Appointment.query.filter(
+        appointments = appointment_query().filter(
             Appointment.patient_id == patient_id,
             Appointment.doctor_id == doctor.id,
             Appointment.status == 'completed'
         ).order_by(Appointment.appointment_date.desc()).all()
 
-        history = []
-        for appointment in appointments:
-            app_data = appointment.to_dict()
-            if appointment.treatment:
-                app_data['treatment'] = appointment.treatment.to_dict()
-            history.append(app_data)
-
-        return jsonify(history), 200
+        return jsonify(serialize_appointments(appointments, include_treatment=True)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -200,8 +202,7 @@ def get_patient_history(patient_id):
 @role_required('doctor')
 def manage_availability():
     """Get or set doctor availability"""
-    user = get_current_user()
-    doctor = user.doctor_profile
+    doctor = current_doctor()
 
     if request.method == 'GET':
         try:
@@ -253,7 +254,7 @@ def manage_availability():
 
             db.session.commit()
 
-            cache_clear_pattern('doctors:*')
+            cache_invalidate('doctors')
 
             return jsonify({'message': 'Availability updated successfully'}), 200
         except Exception as e:
@@ -0,0 +1,22 @@
+from flask import Blueprint, jsonify
+from app import db
+from app.redis_breaker import redis_breaker
+
+bp = Blueprint('health', __name__, url_prefix='/api/health')
+
+@bp.route('', methods=['GET'])
+def health():
+    """Liveness of the database and Redis circuit breaker state"""
+    try:
+        db.session.execute(db.text('SELECT 1'))
+        database = 'ok'
+    except Exception as e:
+        database = f'error: {e}'
+
+    redis_status = redis_breaker.status()
+
+    return jsonify({
+        'status': 'ok' if database == 'ok' else 'degraded',
+        'database': database,
+        'redis': redis_status
+    }), 200 if database == 'ok' else 503
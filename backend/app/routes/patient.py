@@ -1,56 +1,63 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models import Patient, Doctor, Appointment, Department, DoctorAvailability
-from app.utils import role_required, get_current_user, cache_get, cache_set, cache_clear_pattern
+from app.models import User, Patient, Doctor, Appointment, Department, DoctorAvailability
+from app.utils import role_required, current_patient, cache_get, cache_set, cache_get_or_compute, cache_invalidate
 from app.tasks import export_patient_treatments_csv
+from app.queries import appointment_query, doctor_query, serialize_appointments
+from app.search import search_backend
+from app.routing import primary_reads
+from collections import defaultdict
 from datetime import datetime, date, timedelta
 
 bp = Blueprint('patient', __name__, url_prefix='/api/patient')
 
+# Soft TTL: served as fresh. Hard TTL: kept and served stale while one request recomputes.
+# The patient dashboard must reflect the patient's own bookings, so it never serves a
+# pre-invalidation value.
+DASHBOARD_SOFT_TTL = 60
+DASHBOARD_HARD_TTL = 120
+SEARCH_SOFT_TTL = 60
+SEARCH_HARD_TTL = 180
+
 @bp.route('/dashboard', methods=['GET'])
 @role_required('patient')
 def dashboard():
     """Get patient dashboard data"""
-    user = get_current_user()
-    patient = user.patient_profile
+    patient = current_patient()
 
     if not patient:
         return jsonify({'error': 'Patient profile not found'}), 404
 
-    cache_key = f'patient:{patient.id}:dashboard'
-    cached_data = cache_get(cache_key)
-
-    if cached_data:
-        return jsonify(cached_data), 200
-
-    try:
+    def compute():
         # Get all departments
         departments = Department.query.all()
 
         # Get upcoming appointments
         today = date.today()
-        upcoming_appointments = Appointment.query.filter(
+        upcoming_appointments = appointment_query().filter(
             Appointment.patient_id == patient.id,
             Appointment.appointment_date >= today,
             Appointment.status == 'booked'
         ).order_by(Appointment.appointment_date, Appointment.appointment_time).all()
 
         # Get recent appointment history
-        past_appointments = Appointment.query.filter(
+        past_appointments = appointment_query().filter(
             Appointment.patient_id == patient.id,
             Appointment.status.in_(['completed', 'cancelled'])
         ).order_by(Appointment.appointment_date.desc()).limit(5).all()
 
-        data = {
+        return {
             'patient': patient.to_dict(),
             'departments': [dept.to_dict() for dept in departments],
-            'upcoming_appointments': [app.to_dict() for app in upcoming_appointments],
-            'recent_appointments': [app.to_dict() for app in past_appointments]
+            'upcoming_appointments': serialize_appointments(upcoming_appointments),
+            'recent_appointments': serialize_appointments(past_appointments)
         }
 
-        # Cache for 2 minutes
-        cache_set(cache_key, data, 120)
-
+    try:
+        data = cache_get_or_compute(
+            f'patient:{patient.id}:dashboard', compute,
+            soft_ttl=DASHBOARD_SOFT_TTL, hard_ttl=DASHBOARD_HARD_TTL, serve_stale=False
+        )
         return jsonify(data), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -59,8 +66,7 @@ def dashboard():
 @role_required('patient')
 def manage_profile():
     """Get or update patient profile"""
-    user = get_current_user()
-    patient = user.patient_profile
+    patient = current_patient()
 
     if request.method == 'GET':
         return jsonify(patient.to_dict()), 200
@@ -91,9 +97,10 @@ def manage_profile():
             if 'medical_history' in data:
                 patient.medical_history = data['medical_history']
 
+            search_backend().index_patient(patient)
             db.session.commit()
 
-            cache_clear_pattern(f'patient:{patient.id}:*')
+            cache_invalidate(f'patient:{patient.id}')
 
             return jsonify({
                 'message': 'Profile updated successfully',
@@ -112,49 +119,48 @@ def search_doctors():
         specialization = request.args.get('specialization', '')
         department_id = request.args.get('department_id')
 
-        cache_key = f'doctors:search:{search}:{specialization}:{department_id}'
-        cached_data = cache_get(cache_key)
-
-        if cached_data:
-            return jsonify(cached_data), 200
-
-        query = Doctor.query.join(Doctor.user).filter(Doctor.user.has(is_active=True))
+        def compute():
+            query = doctor_query().join(Doctor.user).filter(User.is_active == True)
 
-        if search:
-            query = query.filter(
-                (Doctor.user.has(full_name=search)) |
-                (Doctor.specialization.ilike(f'%{search}%'))
-            )
+            if search:
+                matches = search_backend().doctor_matches(search).subquery()
+                query = query.join(matches, matches.c.id == Doctor.id).order_by(matches.c.rank)
 
-        if specialization:
-            query = query.filter(Doctor.specialization.ilike(f'%{specialization}%'))
+            if specialization:
+                query = query.filter(Doctor.specialization.ilike(f'%{specialization}%'))
 
-        if department_id:
-            query = query.filter(Doctor.department_id == department_id)
+            if department_id:
+                query = query.filter(Doctor.department_id == department_id)
 
-        doctors = query.all()
-        result = []
+            doctors = query.all()
 
-        for doctor in doctors:
-            doctor_data = doctor.to_dict()
-
-            # Get availability for next 7 days
+            # Availability for next 7 days, fetched for all matched doctors at once
             today = date.today()
             next_week = today + timedelta(days=7)
 
-            availabilities = DoctorAvailability.query.filter(
-                DoctorAvailability.doctor_id == doctor.id,
-                DoctorAvailability.date >= today,
-                DoctorAvailability.date <= next_week,
-                DoctorAvailability.is_available == True
-            ).all()
-
-            doctor_data['availability'] = [avail.to_dict() for avail in availabilities]
-            result.append(doctor_data)
-
-        # Cache for 3 minutes
-        cache_set(cache_key, result, 180)
-
+            availability_by_doctor = defaultdict(list)
+            if doctors:
+                availabilities = DoctorAvailability.query.filter(
+                    DoctorAvailability.doctor_id.in_([doctor.id for doctor in doctors]),
+                    DoctorAvailability.date >= today,
+                    DoctorAvailability.date <= next_week,
+                    DoctorAvailability.is_available == True
+                ).order_by(DoctorAvailability.date).all()
+
+                for avail in availabilities:
+                    availability_by_doctor[avail.doctor_id].append(avail.to_dict())
+
+            result = []
+            for doctor in doctors:
+                doctor_data = doctor.to_dict()
+                doctor_data['availability'] = availability_by_doctor[doctor.id]
+                result.append(doctor_data)
+            return result
+
+        result = cache_get_or_compute(
+            f'doctors:search:{search}:{specialization}:{department_id}', compute,
+            soft_ttl=SEARCH_SOFT_TTL, hard_ttl=SEARCH_HARD_TTL
+        )
         return jsonify(result), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -163,27 +169,18 @@ def search_doctors():
 @role_required('patient')
 def get_appointments():
     """Get patient's appointments"""
-    user = get_current_user()
-    patient = user.patient_profile
+    patient = current_patient()
 
     try:
         status = request.args.get('status')
 
-        query = Appointment.query.filter_by(patient_id=patient.id)
+        query = appointment_query().filter_by(patient_id=patient.id)
 
         if status:
             query = query.filter_by(status=status)
 
         appointments = query.order_by(Appointment.appointment_date.desc()).all()
-
-        result = []
-        for appointment in appointments:
-            app_data = appointment.to_dict()
-            if appointment.treatment:
-                app_data['treatment'] = appointment.treatment.to_dict()
-            result.append(app_data)
-
-        return jsonify(result), 200
+        return jsonify(serialize_appointments(appointments, include_treatment=True)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -191,8 +188,7 @@ def get_appointments():
 @role_required('patient')
 def get_appointment_history():
     """Get patient's appointment history with treatments"""
-    user = get_current_user()
-    patient = user.patient_profile
+    patient = current_patient()
 
     cache_key = f'patient:{patient.id}:history'
     cached_data = cache_get(cache_key)
@@ -201,17 +197,14 @@ def get_appointment_history():
         return jsonify(cached_data), 200
 
     try:
-        appointments = Appointment.query.filter(
-            Appointment.patient_id == patient.id,
-            Appointment.status == 'completed'
-        ).order_by(Appointment.appointment_date.desc()).all()
+        # Built on the primary: a lagging replica would be cached for the full TTL
+        with primary_reads():
+            appointments = appointment_query().filter(
+                Appointment.patient_id == patient.id,
+                Appointment.status == 'completed'
+            ).order_by(Appointment.appointment_date.desc()).all()
 
-        result = []
-        for appointment in appointments:
-            app_data = appointment.to_dict()
-            if appointment.treatment:
-                app_data['treatment'] = appointment.treatment.to_dict()
-            result.append(app_data)
+            result = serialize_appointments(appointments, include_treatment=True)
 
         # Cache for 5 minutes
         cache_set(cache_key, result, 300)
@@ -224,12 +217,12 @@ def get_appointment_history():
 @role_required('patient')
 def export_treatments():
     """Trigger async job to export treatment history as CSV"""
-    user = get_current_user()
-    patient = user.patient_profile
+    patient = current_patient()
 
     try:
-        # Trigger async Celery task
-        task = export_patient_treatments_csv.delay(patient.id)
+        # Trigger async Celery task; {"compress": true} asks for a gzipped file
+        compress = (request.get_json(silent=True) or {}).get('compress')
+        task = export_patient_treatments_csv.delay(patient.id, compress)
 
         return jsonify({
             'message': 'Export started. You will be notified when complete.',
@@ -252,6 +245,13 @@ def get_export_status(task_id):
                 'status': 'pending',
                 'message': 'Task is waiting to be processed'
             }
+        elif task.state == 'PROGRESS':
+            response = {
+                'status': 'in_progress',
+                'current': task.info.get('current', 0),
+                'total': task.info.get('total', 0),
+                'percent': task.info.get('percent', 0)
+            }
         elif task.state == 'SUCCESS':
             response = {
                 'status': 'completed',
@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+from flask import g, request, has_app_context
+from flask_sqlalchemy.session import Session
+
+# Read-replica routing. With DATABASE_REPLICA_URL set, GET requests and
+# reporting tasks read from the 'replica' bind; writes (flushes and DML
+# statements) always go to the primary. A user who just changed something
+# is pinned to the primary for REPLICA_PIN_SECONDS so they read their own
+# writes despite replication lag. Values that get cached are always computed on
+# the primary, or a lagging replica would be served to everyone for a full TTL.
+REPLICA = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+
+
+def reads_from_replica():
+    return has_app_context() and g.get('db_route') == REPLICA
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends reads to the replica when the current context asks for it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not getattr(clause, 'is_dml', False) and reads_from_replica():
+            engine = self._db.engines.get(REPLICA)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def replica_reads():
+    """Route the reads inside the block to the replica, e.g. in a reporting task"""
+    previous = g.get('db_route')
+    g.db_route = REPLICA
+    try:
+        yield
+    finally:
+        g.db_route = previous
+
+
+@contextmanager
+def primary_reads():
+    """Route the reads inside the block to the primary, e.g. when building a value to cache"""
+    previous = g.get('db_route')
+    g.db_route = None
+    try:
+        yield
+    finally:
+        g.db_route = previous
+
+
+def pin_key(user_id):
+    return f'user:{user_id}:primary'
+
+
+def init_routing(app):
+    """Install the request hooks that choose primary or replica; no-op without a replica"""
+    if REPLICA not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+
+    from app.redis_breaker import redis_available
+    from app.utils import cache_get, cache_set, current_principal
+
+    @app.before_request
+    def choose_database():
+        # Pins live in Redis, so without it a user's next read could miss their write
+        if request.method not in READ_METHODS or not redis_available():
+            return
+        principal = current_principal()
+        if principal and cache_get(pin_key(principal['user_id'])):
+            return
+        g.db_route = REPLICA
+
+    @app.after_request
+    def pin_writer(response):
+        principal = g.get('principal')
+        if principal and request.method not in READ_METHODS + ('OPTIONS',) and response.status_code < 400:
+            cache_set(pin_key(principal['user_id']), True, app.config['REPLICA_PIN_SECONDS'])
+        return response
@@ -0,0 +1,62 @@
+from flask import jsonify, request
+from sqlalchemy import inspect
+from app import db
+
+UPGRADE_COMMAND = 'flask --app start_backend db upgrade'
+
+# Indexes the code relies on for correctness, not just speed. db.create_all()
+# builds them on new tables only, so older databases get them from migrations.
+REQUIRED_INDEXES = {
+    # Booking no longer checks for conflicts itself; without it slots can be double-booked
+    'appointments': ['uq_appointments_booked_slot'],
+}
+
+
+def schema_problems():
+    """Model columns and required indexes missing from existing tables of the primary database.
+
+    db.create_all() only creates missing tables, so columns added to existing
+    ones arrive through migrations; a database that skipped them fails on
+    every query touching the model.
+    """
+    inspector = inspect(db.engine)
+    problems = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        problems.extend(
+            f'column {table.name}.{column.name}'
+            for column in table.columns if column.name not in existing
+        )
+
+    for table, names in REQUIRED_INDEXES.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        problems.extend(f'index {table}.{name}' for name in names if name not in existing)
+    return problems
+
+
+def init_schema_check(app):
+    """Refuse API requests while the database is behind the models; call inside an app context after create_all()"""
+    problems = schema_problems()
+    app.extensions['schema_problems'] = problems
+    if not problems:
+        return True
+
+    print("⚠" * 3 + f" Database schema is out of date, run `{UPGRADE_COMMAND}`. Missing:")
+    for problem in problems:
+        print(f"    - {problem}")
+    print("⚠" * 3 + " Requests are answered with 503 until the upgrade has run and the app is restarted")
+
+    @app.before_request
+    def refuse_stale_schema():
+        if request.method == 'OPTIONS':
+            return None
+        return jsonify({
+            'error': f'Database schema is out of date; run `{UPGRADE_COMMAND}`',
+            'missing': problems
+        }), 503
+
+    return False
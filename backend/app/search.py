@@ -0,0 +1,194 @@
+from flask import current_app
+from sqlalchemy import select, or_, and_, func, literal, text, Integer, Float
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import User, Doctor, Patient
+import re
+
+
+def search_tokens(term):
+    """Split a search box string into word tokens"""
+    return re.findall(r'\w+', term or '')
+
+
+class LikeSearch:
+    """Fallback backend: ILIKE '%token%' on the base tables, no ranking"""
+
+    name = 'like'
+
+    def setup(self):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def index_doctor(self, doctor):
+        pass
+
+    def index_patient(self, patient):
+        pass
+
+    def doctor_matches(self, term):
+        """Select of (id, rank) for doctors matching term; lower rank is better"""
+        conditions = [
+            or_(User.full_name.ilike(f'%{token}%'), Doctor.specialization.ilike(f'%{token}%'))
+            for token in search_tokens(term)
+        ]
+        return select(Doctor.id.label('id'), literal(0.0).label('rank')).join(User).where(
+            and_(*conditions) if conditions else literal(False)
+        )
+
+    def patient_matches(self, term):
+        """Select of (id, rank) for patients matching term; lower rank is better"""
+        conditions = [
+            or_(
+                User.full_name.ilike(f'%{token}%'),
+                User.email.ilike(f'%{token}%'),
+                User.phone.ilike(f'%{token}%')
+            )
+            for token in search_tokens(term)
+        ]
+        return select(Patient.id.label('id'), literal(0.0).label('rank')).join(User).where(
+            and_(*conditions) if conditions else literal(False)
+        )
+
+
+class SqliteFtsSearch(LikeSearch):
+    """SQLite FTS5 tables mirroring the searchable columns, ranked by bm25 with prefix matching"""
+
+    name = 'sqlite-fts5'
+
+    def setup(self):
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS doctor_search "
+            "USING fts5(doctor_id UNINDEXED, full_name, specialization)"
+        ))
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS patient_search "
+            "USING fts5(patient_id UNINDEXED, full_name, email, phone)"
+        ))
+        db.session.commit()
+
+        # Backfill rows written before the index existed or outside the sync hooks
+        indexed_doctors = db.session.execute(text("SELECT count(*) FROM doctor_search")).scalar()
+        indexed_patients = db.session.execute(text("SELECT count(*) FROM patient_search")).scalar()
+        if indexed_doctors != Doctor.query.count() or indexed_patients != Patient.query.count():
+            self.rebuild()
+
+    def rebuild(self):
+        db.session.execute(text("DELETE FROM doctor_search"))
+        db.session.execute(text("DELETE FROM patient_search"))
+        db.session.execute(text(
+            "INSERT INTO doctor_search (doctor_id, full_name, specialization) "
+            "SELECT doctors.id, users.full_name, doctors.specialization "
+            "FROM doctors JOIN users ON users.id = doctors.user_id"
+        ))
+        db.session.execute(text(
+            "INSERT INTO patient_search (patient_id, full_name, email, phone) "
+            "SELECT patients.id, users.full_name, users.email, users.phone "
+            "FROM patients JOIN users ON users.id = patients.user_id"
+        ))
+        db.session.commit()
+
+    def index_doctor(self, doctor):
+        db.session.execute(text("DELETE FROM doctor_search WHERE doctor_id = :id"), {'id': doctor.id})
+        db.session.execute(
+            text("INSERT INTO doctor_search (doctor_id, full_name, specialization) VALUES (:id, :name, :spec)"),
+            {'id': doctor.id, 'name': doctor.user.full_name, 'spec': doctor.specialization}
+        )
+
+    def index_patient(self, patient):
+        db.session.execute(text("DELETE FROM patient_search WHERE patient_id = :id"), {'id': patient.id})
+        db.session.execute(
+            text("INSERT INTO patient_search (patient_id, full_name, email, phone) VALUES (:id, :name, :email, :phone)"),
+            {'id': patient.id, 'name': patient.user.full_name, 'email': patient.user.email, 'phone': patient.user.phone}
+        )
+
+    def _match(self, table, id_column, term):
+        # Every token must match as a prefix; tokens are quoted so FTS5 syntax is never interpreted
+        tokens = search_tokens(term)
+        query = ' '.join(f'"{token}"*' for token in tokens) if tokens else '""'
+        return text(
+            f"SELECT {id_column} AS id, rank FROM {table} WHERE {table} MATCH :q"
+        ).bindparams(q=query).columns(id=Integer, rank=Float)
+
+    def doctor_matches(self, term):
+        return self._match('doctor_search', 'doctor_id', term)
+
+    def patient_matches(self, term):
+        return self._match('patient_search', 'patient_id', term)
+
+
+class PostgresTrigramSearch(LikeSearch):
+    """PostgreSQL pg_trgm GIN indexes on the base columns, ranked by trigram similarity"""
+
+    name = 'postgres-trgm'
+
+    INDEXES = [
+        ('ix_users_full_name_trgm', 'users', 'full_name'),
+        ('ix_users_email_trgm', 'users', 'email'),
+        ('ix_users_phone_trgm', 'users', 'phone'),
+        ('ix_doctors_specialization_trgm', 'doctors', 'specialization'),
+    ]
+
+    def setup(self):
+        # Indexes live on the base tables, so PostgreSQL keeps them in sync and
+        # index_doctor/index_patient have nothing to do
+        db.session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for name, table, column in self.INDEXES:
+            db.session.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+            ))
+        db.session.commit()
+
+    def doctor_matches(self, term):
+        rank = -func.greatest(
+            func.similarity(User.full_name, term),
+            func.similarity(Doctor.specialization, term)
+        )
+        return super().doctor_matches(term).with_only_columns(Doctor.id.label('id'), rank.label('rank'))
+
+    def patient_matches(self, term):
+        rank = -func.greatest(
+            func.similarity(User.full_name, term),
+            func.similarity(User.email, term),
+            func.similarity(func.coalesce(User.phone, ''), term)
+        )
+        return super().patient_matches(term).with_only_columns(Patient.id.label('id'), rank.label('rank'))
+
+
+BACKENDS = {
+    'like': LikeSearch,
+    'sqlite-fts5': SqliteFtsSearch,
+    'postgres-trgm': PostgresTrigramSearch,
+}
+
+
+def init_search(app):
+    """Pick and set up the search backend; call inside an app context after create_all()"""
+    configured = app.config.get('SEARCH_BACKEND', 'auto')
+
+    if configured == 'auto':
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            configured = 'sqlite-fts5'
+        elif dialect == 'postgresql':
+            configured = 'postgres-trgm'
+        else:
+            configured = 'like'
+
+    backend = BACKENDS[configured]()
+    try:
+        backend.setup()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"⚠ Search backend '{backend.name}' unavailable, falling back to LIKE: {e}")
+        backend = LikeSearch()
+
+    app.extensions['search'] = backend
+    return backend
+
+
+def search_backend():
+    """The search backend for the current app"""
+    return current_app.extensions['search']
@@ -1,166 +1,271 @@
-from celery import Celery
+from app.celery_app import celery
+from app.notifiers import notifier
+from app.redis_breaker import get_redis
+from app.reports import previous_month, write_monthly_reports
+from app.routing import replica_reads
+from app.warehouse import run_export
+from celery import chord
+from celery.schedules import crontab
+from redis.exceptions import RedisError
+from flask import current_app
 from datetime import datetime, timedelta, date
 import csv
-import io
+import gzip
+import os
+import time
 
-celery = Celery('tasks', broker='redis://localhost:6379/0', backend='redis://localhost:6379/0')
+# Reminders fan out in batches of REMINDER_BATCH_SIZE appointments. Each
+# appointment is claimed with an idempotency key before it is sent, so a
+# retried batch skips the reminders that already went out.
+REMINDER_KEY_TTL = 2 * 24 * 3600
+
+def reminder_key(appointment_id, day):
+    return f'reminder:sent:{appointment_id}:{day.isoformat()}'
 
 @celery.task
 def send_daily_reminders():
-    """Send daily reminders to patients with appointments today"""
-    from app import create_app, db
+    """Send daily reminders to patients with appointments today, in parallel batches"""
+    from app import db
     from app.models import Appointment
 
-    app = create_app()
-    with app.app_context():
-        today = date.today()
-        appointments = Appointment.query.filter(
-            Appointment.appointment_date == today,
-            Appointment.status == 'booked'
-        ).all()
+    today = date.today()
+    batch_size = current_app.config['REMINDER_BATCH_SIZE']
+
+    # Only ids are streamed here; each batch task loads its own rows
+    appointment_ids = db.session.query(Appointment.id).filter(
+        Appointment.appointment_date == today,
+        Appointment.status == 'booked'
+    ).order_by(Appointment.id).yield_per(batch_size)
+
+    batches = []
+    batch = []
+    for (appointment_id,) in appointment_ids:
+        batch.append(appointment_id)
+        if len(batch) >= batch_size:
+            batches.append(send_reminder_batch.s(batch, today.isoformat()))
+            batch = []
+    if batch:
+        batches.append(send_reminder_batch.s(batch, today.isoformat()))
+
+    if not batches:
+        return "Sent 0 reminders"
+
+    chord(batches)(summarize_reminders.s(today.isoformat()))
+    return f"Queued {len(batches)} reminder batches"
+
+@celery.task(bind=True, autoretry_for=(RedisError,), retry_backoff=True, max_retries=5, default_retry_delay=60)
+def send_reminder_batch(self, appointment_ids, day):
+    """Send reminders for one batch of appointments; safe to retry"""
+    from app.models import Appointment
+    from app.queries import appointment_query
+
+    day = date.fromisoformat(day)
+    client = get_redis()
+    if client is None:
+        # Without the idempotency keys a retry could send twice
+        raise self.retry(exc=RuntimeError('Redis unavailable for reminder idempotency keys'))
+
+    appointments = appointment_query().filter(
+        Appointment.id.in_(appointment_ids),
+        Appointment.status == 'booked'
+    ).order_by(Appointment.id).all()
 
-        for appointment in appointments:
-            patient_name = appointment.patient.user.full_name
-            doctor_name = appointment.doctor.user.full_name
-            time = appointment.appointment_time.strftime('%H:%M')
+    sent = skipped = failed = 0
+    for appointment in appointments:
+        key = reminder_key(appointment.id, day)
+        if not client.set(key, 1, ex=REMINDER_KEY_TTL, nx=True):
+            skipped += 1
+            continue
 
-            # In production, send via email/SMS/Google Chat
-            message = f"Reminder: {patient_name} has an appointment with Dr. {doctor_name} today at {time}"
-            print(f"REMINDER: {message}")
+        slot = appointment.appointment_time.strftime('%H:%M')
+        message = (f"Reminder: {appointment.patient.user.full_name} has an appointment with "
+                   f"Dr. {appointment.doctor.user.full_name} today at {slot}")
+        try:
+            notifier().send(appointment.patient.user.email, 'reminder', message)
+            sent += 1
+        except Exception as e:
+            client.delete(key)
+            failed += 1
+            print(f"Reminder for appointment {appointment.id} failed: {e}")
 
-        return f"Sent {len(appointments)} reminders"
+    if failed:
+        raise self.retry(exc=RuntimeError(f'{failed} reminders failed'))
+
+    return {'sent': sent, 'skipped': skipped}
 
 @celery.task
-def send_monthly_report(doctor_id):
-    """Generate and send monthly activity report for a doctor"""
-    from app import create_app, db
-    from app.models import Doctor, Appointment, Treatment
-
-    app = create_app()
-    with app.app_context():
-        doctor = Doctor.query.get(doctor_id)
-        if not doctor:
-            return "Doctor not found"
-
-        # Get last month's data
-        today = date.today()
-        first_day = today.replace(day=1)
-        last_month_end = first_day - timedelta(days=1)
-        last_month_start = last_month_end.replace(day=1)
-
-        appointments = Appointment.query.filter(
-            Appointment.doctor_id == doctor_id,
-            Appointment.appointment_date >= last_month_start,
-            Appointment.appointment_date <= last_month_end,
-            Appointment.status == 'completed'
-        ).all()
-
-        # Generate HTML report
-        html_content = f"""
-        <html>
-        <head><title>Monthly Activity Report - {doctor.user.full_name}</title></head>
-        <body>
-            <h1>Monthly Activity Report</h1>
-            <h2>Dr. {doctor.user.full_name} - {doctor.specialization}</h2>
-            <p>Period: {last_month_start.strftime('%B %Y')}</p>
-            <p>Total Appointments: {len(appointments)}</p>
-
-            <table border="1">
-                <tr>
-                    <th>Date</th>
-                    <th>Patient</th>
-                    <th>Diagnosis</th>
-                    <th>Treatment</th>
-                </tr>
-        """
-
-        for appointment in appointments:
-            if appointment.treatment:
-                html_content += f"""
-                <tr>
-                    <td>{appointment.appointment_date}</td>
-                    <td>{appointment.patient.user.full_name}</td>
-                    <td>{appointment.treatment.diagnosis}</td>
-                    <td>{appointment.treatment.prescription}</td>
-                </tr>
-                """
-
-        html_content += """
-            </table>
-        </body>
-        </html>
-        """
-
-        # In production, send via email
-        print(f"MONTHLY REPORT for Dr. {doctor.user.full_name}")
-        print(html_content)
-
-        return f"Report generated for {doctor.user.full_name}"
+def summarize_reminders(results, day):
+    """Chord callback: total up the reminder batches"""
+    sent = sum(result['sent'] for result in results)
+    skipped = sum(result['skipped'] for result in results)
+    print(f"Reminders for {day}: {sent} sent, {skipped} already sent, {len(results)} batches")
+    return f"Sent {sent} reminders"
+
+@celery.task
+def send_monthly_reports(month=None):
+    """Generate last month's reports for all active doctors in parallel batches"""
+    from app import db
+    from app.models import User, Doctor
+
+    month = month or previous_month()
+    batch_size = current_app.config['REPORT_BATCH_SIZE']
+
+    with replica_reads():
+        doctor_ids = [doctor_id for (doctor_id,) in db.session.query(Doctor.id).join(User).filter(
+            User.is_active == True
+        ).order_by(Doctor.id)]
+
+    batches = [
+        send_monthly_report_batch.s(doctor_ids[i:i + batch_size], month)
+        for i in range(0, len(doctor_ids), batch_size)
+    ]
+    if not batches:
+        return f"No active doctors for {month}"
+
+    chord(batches)(summarize_monthly_reports.s(month, time.time()))
+    return f"Queued {len(batches)} report batches for {month}"
+
+@celery.task
+def send_monthly_report_batch(doctor_ids, month):
+    """Generate and send monthly activity reports for a batch of doctors"""
+    started = time.perf_counter()
+    with replica_reads():
+        reports = write_monthly_reports(doctor_ids, month)
+
+    for doctor, path in reports:
+        notifier().send(doctor.user.email, 'monthly report', f"Monthly report for {month} is ready: {path}")
+
+    return {'reports': len(reports), 'seconds': round(time.perf_counter() - started, 3)}
+
+@celery.task
+def summarize_monthly_reports(results, month, queued_at):
+    """Chord callback: log per-run timing metrics"""
+    reports = sum(result['reports'] for result in results)
+    slowest = max(result['seconds'] for result in results)
+    elapsed = time.time() - queued_at
+    print(f"Monthly reports for {month}: {reports} reports in {len(results)} batches, "
+          f"{elapsed:.1f}s total, slowest batch {slowest:.1f}s")
+    return {'month': month, 'reports': reports, 'batches': len(results), 'seconds': round(elapsed, 3)}
 
 @celery.task
-def export_patient_treatments_csv(patient_id):
-    """Export patient treatment history as CSV"""
-    from app import create_app, db
-    from app.models import Patient, Appointment, Treatment
+def send_monthly_report(doctor_id, month=None):
+    """Generate and send the monthly activity report for one doctor"""
+    result = send_monthly_report_batch.run([doctor_id], month or previous_month())
+    if not result['reports']:
+        return "Doctor not found"
+    return f"Report generated for doctor {doctor_id}"
 
-    app = create_app()
-    with app.app_context():
+EXPORT_CHUNK_SIZE = 1000
+
+@celery.task(bind=True)
+def export_patient_treatments_csv(self, patient_id, compress=None):
+    """Export patient treatment history as CSV, streamed to disk with progress updates"""
+    from app import db
+    from app.models import User, Doctor, Patient, Appointment, Treatment
+
+    if compress is None:
+        compress = current_app.config['EXPORT_COMPRESS']
+
+    with replica_reads():
         patient = Patient.query.get(patient_id)
         if not patient:
             return {"error": "Patient not found"}
 
-        appointments = Appointment.query.filter(
+        rows = db.session.query(
+            User.full_name,
+            Appointment.appointment_date,
+            Treatment.diagnosis,
+            Treatment.prescription,
+            Treatment.next_visit_date
+        ).join(Treatment, Treatment.appointment_id == Appointment.id).join(
+            Doctor, Doctor.id == Appointment.doctor_id
+        ).join(
+            User, User.id == Doctor.user_id
+        ).filter(
             Appointment.patient_id == patient_id,
             Appointment.status == 'completed'
-        ).all()
-
-        # Create CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Header
-        writer.writerow([
-            'Patient ID',
-            'Patient Name',
-            'Doctor Name',
-            'Appointment Date',
-            'Diagnosis',
-            'Treatment',
-            'Next Visit'
-        ])
-
-        # Data rows
-        for appointment in appointments:
-            if appointment.treatment:
-                writer.writerow([
-                    patient.id,
-                    patient.user.full_name,
-                    appointment.doctor.user.full_name,
-                    appointment.appointment_date,
-                    appointment.treatment.diagnosis,
-                    appointment.treatment.prescription,
-                    appointment.treatment.next_visit_date or 'N/A'
-                ])
+        ).order_by(Appointment.appointment_date, Appointment.id)
 
-        csv_content = output.getvalue()
-        output.close()
+        total = rows.count()
+        patient_name = patient.user.full_name
 
-        # In production, save to file system or send via email
         filename = f"patient_{patient_id}_treatments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        filepath = f"exports/{filename}"
+        if compress:
+            filename += '.gz'
+        directory = current_app.config['EXPORT_DIR']
+        filepath = os.path.join(directory, filename)
+        os.makedirs(directory, exist_ok=True)
 
-        # For now, store in a temporary location
-        import os
-        os.makedirs('exports', exist_ok=True)
-        with open(filepath, 'w', newline='') as f:
-            f.write(csv_content)
+        # Write under a temporary name so a half-written file is never served
+        partial = filepath + '.part'
+        opener = gzip.open if compress else open
+        written = 0
+        with opener(partial, 'wt', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                'Patient ID',
+                'Patient Name',
+                'Doctor Name',
+                'Appointment Date',
+                'Diagnosis',
+                'Treatment',
+                'Next Visit'
+            ])
+
+            for doctor_name, appointment_date, diagnosis, prescription, next_visit_date in rows.yield_per(EXPORT_CHUNK_SIZE):
+                writer.writerow([
+                    patient_id,
+                    patient_name,
+                    doctor_name,
+                    appointment_date,
+                    diagnosis,
+                    prescription,
+                    next_visit_date or 'N/A'
+                ])
+                written += 1
+                if written % EXPORT_CHUNK_SIZE == 0:
+                    self.update_state(state='PROGRESS', meta={
+                        'current': written,
+                        'total': total,
+                        'percent': round(written * 100 / total) if total else 100
+                    })
+        os.replace(partial, filepath)
 
         return {
             "filename": filename,
             "filepath": filepath,
+            "rows": written,
+            "compressed": bool(compress),
             "status": "completed"
         }
 
+WAREHOUSE_LOCK = 'warehouse:export:lock'
+
+@celery.task(bind=True)
+def export_warehouse(self, full=False):
+    """Export appointments, treatments, doctors and departments as month-partitioned Parquet"""
+    redis = get_redis()
+    if redis is not None and not redis.set(WAREHOUSE_LOCK, self.request.id or 'local', nx=True, ex=3600):
+        return {"status": "skipped", "message": "Another warehouse export is running"}
+
+    def progress(current, total, table):
+        self.update_state(state='PROGRESS', meta={
+            'current': current,
+            'total': total,
+            'percent': round(current * 100 / total),
+            'table': table
+        })
+
+    try:
+        with replica_reads():
+            result = run_export(full, progress)
+    finally:
+        if redis is not None:
+            redis.delete(WAREHOUSE_LOCK)
+
+    result['status'] = 'completed'
+    return result
+
 # Configure Celery beat schedule
 celery.conf.beat_schedule = {
     'send-daily-reminders': {
@@ -168,7 +273,7 @@ celery.conf.beat_schedule = {
         'schedule': timedelta(days=1),  # Run every day
     },
     'send-monthly-reports': {
-        'task': 'app.tasks.send_monthly_report',
-        'schedule': timedelta(days=30),  # Run monthly
+        'task': 'app.tasks.send_monthly_reports',
+        'schedule': crontab(minute=0, hour=6, day_of_month=1),  # 06:00 on the 1st of each month
     },
 }
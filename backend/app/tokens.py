@@ -0,0 +1,95 @@
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from redis.exceptions import RedisError
+from app.redis_breaker import redis_breaker, get_redis
+import time
+import uuid
+
+# Bearer tokens for AUTH_MODE=token. Tokens are signed with SECRET_KEY and carry
+# the user's role and profile id, so authorizing a request needs no database
+# lookup. Logout revokes single tokens by jti; deactivation revokes everything
+# a user was issued up to that moment. Both lists live in Redis.
+ACCESS = 'access'
+REFRESH = 'refresh'
+REVOKED_TOKEN_PREFIX = 'revoked:jti:'
+REVOKED_USER_PREFIX = 'revoked:user:'
+
+
+def token_auth_enabled():
+    return current_app.config.get('AUTH_MODE', 'session') == 'token'
+
+
+def _serializer(kind):
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=f'auth-{kind}')
+
+
+def _ttl(kind):
+    return current_app.config['ACCESS_TOKEN_TTL' if kind == ACCESS else 'REFRESH_TOKEN_TTL']
+
+
+def issue_tokens(principal):
+    """Signed access and refresh tokens for a principal"""
+    claims = {'sub': principal['user_id'], 'role': principal['role'], 'pid': principal['profile_id']}
+    return {
+        'access_token': _serializer(ACCESS).dumps(dict(claims, jti=uuid.uuid4().hex)),
+        'refresh_token': _serializer(REFRESH).dumps(dict(claims, jti=uuid.uuid4().hex)),
+        'token_type': 'Bearer',
+        'expires_in': _ttl(ACCESS)
+    }
+
+
+def verify_token(token, kind=ACCESS):
+    """Claims of a valid, unexpired token (with its issue time as 'iat'), or None"""
+    try:
+        claims, issued_at = _serializer(kind).loads(token, max_age=_ttl(kind), return_timestamp=True)
+    except (SignatureExpired, BadSignature):
+        return None
+    claims['iat'] = issued_at.timestamp()
+    claims['typ'] = kind
+    return claims
+
+
+def is_revoked(claims):
+    """Whether a token was revoked; None when Redis cannot be asked"""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        revoked_token, revoked_before = client.mget([
+            REVOKED_TOKEN_PREFIX + claims['jti'],
+            REVOKED_USER_PREFIX + str(claims['sub'])
+        ])
+        redis_breaker.record_success()
+    except RedisError as e:
+        redis_breaker.record_failure(e)
+        return None
+    return bool(revoked_token) or (revoked_before is not None and claims['iat'] <= float(revoked_before))
+
+
+def revoke_token(claims):
+    """Revoke one token until it would have expired anyway"""
+    remaining = int(claims['iat'] + _ttl(claims['typ']) - time.time()) + 1
+    if remaining <= 0:
+        return True
+    client = get_redis()
+    try:
+        if client:
+            client.setex(REVOKED_TOKEN_PREFIX + claims['jti'], remaining, 1)
+            redis_breaker.record_success()
+            return True
+    except RedisError as e:
+        redis_breaker.record_failure(e)
+    return False
+
+
+def revoke_user_tokens(user_id):
+    """Revoke every token issued to a user so far"""
+    client = get_redis()
+    try:
+        if client:
+            client.setex(REVOKED_USER_PREFIX + str(user_id), _ttl(REFRESH), time.time())
+            redis_breaker.record_success()
+            return True
+    except RedisError as e:
+        redis_breaker.record_failure(e)
+    return False
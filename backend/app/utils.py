@@ -1,14 +1,21 @@
 from functools import wraps
-from flask import request, jsonify, session
-from app.models import User
-import json
-from app import redis_client
-from datetime import timedelta
+from flask import request, jsonify, session, g, current_app
+from app import db
+from app.models import User, Doctor, Patient
+from app.codec import cache_codec
+from app.local_cache import local_cache, INVALIDATION_CHANNEL
+from app.redis_breaker import redis_breaker, get_redis
+from app.routing import primary_reads
+from app.tokens import token_auth_enabled, verify_token, is_revoked, revoke_user_tokens
+from redis.exceptions import RedisError
+from datetime import timedelta, date
+import threading
+import time
 
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        if current_principal() is None:
             return jsonify({'error': 'Authentication required'}), 401
         return f(*args, **kwargs)
     return decorated_function
@@ -17,61 +24,336 @@ def role_required(*roles):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            if 'user_id' not in session:
+            principal = current_principal()
+            if principal is None:
                 return jsonify({'error': 'Authentication required'}), 401
-
-            user = User.query.get(session['user_id'])
-            if not user or user.role not in roles:
+            if principal['role'] not in roles:
                 return jsonify({'error': 'Access denied'}), 403
+            if not principal['is_active']:
+                return jsonify({'error': 'Account is inactive'}), 403
 
             return f(*args, **kwargs)
         return decorated_function
     return decorator
 
 def get_current_user():
-    if 'user_id' in session:
-        return User.query.get(session['user_id'])
-    return None
+    """The logged-in User, loaded at most once per request"""
+    principal = current_principal()
+    if principal is None:
+        return None
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, principal['user_id'])
+    return g.current_user
+
+def load_principal(user_id):
+    """Role, active flag and profile id of a user, from a short-lived cache or one query"""
+    key = f'user:{user_id}:principal'
+    principal = cache_get(key)
+    if principal is not None:
+        return principal
+
+    row = db.session.query(User.role, User.is_active, Doctor.id, Patient.id).outerjoin(
+        Doctor, Doctor.user_id == User.id
+    ).outerjoin(
+        Patient, Patient.user_id == User.id
+    ).filter(User.id == user_id).first()
+    if row is None:
+        return None
+
+    role, is_active, doctor_id, patient_id = row
+    principal = {
+        'user_id': user_id,
+        'role': role,
+        'is_active': is_active,
+        'profile_id': doctor_id if role == 'doctor' else patient_id if role == 'patient' else None
+    }
+    cache_set(key, principal, current_app.config.get('PRINCIPAL_CACHE_TTL', 60))
+    return principal
+
+def bearer_token():
+    """Token from the Authorization: Bearer header, or None"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' and token.strip() else None
+
+def principal_from_token():
+    """Principal from a valid bearer token; the database is only read when Redis is unavailable"""
+    token = bearer_token()
+    claims = verify_token(token) if token else None
+    if claims is None:
+        return None
+
+    revoked = is_revoked(claims)
+    if revoked:
+        return None
+    g.token_claims = claims
+    if revoked is None:
+        # Revocation list unreachable: fall back to the user's current state
+        principal = load_principal(claims['sub'])
+        return principal if principal and principal['is_active'] else None
+
+    return {'user_id': claims['sub'], 'role': claims['role'], 'is_active': True, 'profile_id': claims['pid']}
+
+def current_principal():
+    """The logged-in user's principal, resolved once per request and kept on flask.g"""
+    if 'principal' not in g:
+        if token_auth_enabled():
+            g.principal = principal_from_token()
+        else:
+            g.principal = load_principal(session['user_id']) if 'user_id' in session else None
+    return g.principal
+
+def current_patient():
+    """The logged-in patient's profile, or None"""
+    principal = current_principal()
+    if not principal or principal['role'] != 'patient' or principal['profile_id'] is None:
+        return None
+    return db.session.get(Patient, principal['profile_id'])
+
+def current_doctor():
+    """The logged-in doctor's profile, or None"""
+    principal = current_principal()
+    if not principal or principal['role'] != 'doctor' or principal['profile_id'] is None:
+        return None
+    return db.session.get(Doctor, principal['profile_id'])
+
+def invalidate_principal(user_id):
+    """Drop a user's cached principal and revoke their tokens after a change to their role or active flag"""
+    revoke_user_tokens(user_id)
+    return cache_invalidate(f'user:{user_id}')
+
+# Cache keys are grouped into namespaces: the first segment ('admin', 'doctors', ...),
+# plus 'patient:{id}' / 'doctor:{id}' / 'user:{id}' for per-user keys. Each namespace has a
+# generation counter that is folded into the stored key, so invalidating a
+# namespace is a single INCR and stale entries simply age out via their TTL.
+NAMESPACE_PREFIX = 'ns:'
+SCOPED_NAMESPACES = ('patient', 'doctor', 'user')
+
+def cache_namespaces(key):
+    """Namespaces a key belongs to, outermost first ('patient:5:history' -> ['patient', 'patient:5'])"""
+    parts = key.split(':')
+    if parts[0] in SCOPED_NAMESPACES and len(parts) > 2:
+        return [parts[0], f'{parts[0]}:{parts[1]}']
+    return [parts[0]]
+
+def versioned_key(client, key):
+    """Physical Redis key for key under the current namespace generations"""
+    namespaces = cache_namespaces(key)
+    generations = client.mget([NAMESPACE_PREFIX + namespace for namespace in namespaces])
+    suffix = '.'.join((generation or b'0').decode() for generation in generations)
+    return f'{key}@{suffix}'
 
 def cache_get(key):
-    """Get value from Redis cache"""
+    """Get value from the in-process cache, falling back to Redis"""
+    value = local_cache.get(key)
+    if value is not None:
+        return value
+
+    client = get_redis()
     try:
-        if redis_client:
-            data = redis_client.get(key)
+        if client:
+            data = client.get(versioned_key(client, key))
+            redis_breaker.record_success()
             if data:
-                return json.loads(data)
+                value = cache_codec.decode(data)
+                local_cache.set(key, value, len(data), local_cache.max_ttl)
+                local_cache.record(key, 'redis_hits')
+                return value
+    except RedisError as e:
+        redis_breaker.record_failure(e)
     except Exception as e:
         print(f"Cache get error: {e}")
+
+    local_cache.record(key, 'misses')
     return None
 
 def cache_set(key, value, expiry=300):
-    """Set value in Redis cache with expiry (default 5 minutes)"""
+    """Set value in the in-process cache and Redis with expiry (default 5 minutes)"""
+    payload = cache_codec.encode(value)
+    local_cache.set(key, value, len(payload), expiry)
+
+    client = get_redis()
     try:
-        if redis_client:
-            redis_client.setex(key, expiry, json.dumps(value))
+        if client:
+            client.setex(versioned_key(client, key), expiry, payload)
+            redis_breaker.record_success()
             return True
+    except RedisError as e:
+        redis_breaker.record_failure(e)
     except Exception as e:
         print(f"Cache set error: {e}")
     return False
 
 def cache_delete(key):
-    """Delete key from Redis cache"""
+    """Delete key from the in-process cache and Redis, and tell other workers"""
+    local_cache.delete(key)
+
+    client = get_redis()
     try:
-        if redis_client:
-            redis_client.delete(key)
+        if client:
+            pipe = client.pipeline(transaction=False)
+            pipe.delete(versioned_key(client, key))
+            pipe.publish(INVALIDATION_CHANNEL, key)
+            pipe.execute()
+            redis_breaker.record_success()
             return True
+    except RedisError as e:
+        redis_breaker.record_failure(e)
     except Exception as e:
         print(f"Cache delete error: {e}")
     return False
 
-def cache_clear_pattern(pattern):
-    """Clear all keys matching pattern"""
+def cache_invalidate(namespace):
+    """Invalidate every key in a namespace ('admin', 'doctors', 'patient:5', ...) with one INCR"""
+    local_cache.invalidate(namespace)
+
+    client = get_redis()
     try:
-        if redis_client:
-            keys = redis_client.keys(pattern)
-            if keys:
-                redis_client.delete(*keys)
+        if client:
+            pipe = client.pipeline(transaction=False)
+            pipe.incr(NAMESPACE_PREFIX + namespace)
+            pipe.publish(INVALIDATION_CHANNEL, namespace)
+            pipe.execute()
+            redis_breaker.record_success()
             return True
+    except RedisError as e:
+        redis_breaker.record_failure(e)
     except Exception as e:
-        print(f"Cache clear error: {e}")
+        print(f"Cache invalidate error: {e}")
     return False
+
+def cache_stats():
+    """Per-process cache usage and hit/miss counts by key namespace"""
+    return local_cache.stats()
+
+# First key segments written through cache_set. The rest of the Redis DB (namespace
+# generations, token revocations, rate limits, reminder claims, locks, Celery) is not cache.
+CACHE_NAMESPACES = ('admin', 'appointments', 'departments', 'doctor', 'doctors', 'patient', 'user', 'last')
+
+def cache_purge_pattern(pattern, batch_size=500):
+    """Delete physical keys matching pattern using SCAN; for admin maintenance only, never on request paths.
+
+    The pattern must start with a literal cache namespace ('doctors:*'); raises ValueError otherwise.
+    """
+    if pattern.split(':')[0] not in CACHE_NAMESPACES:
+        raise ValueError(f"Pattern must start with one of: {', '.join(n + ':' for n in CACHE_NAMESPACES)}")
+
+    local_cache.clear()
+    deleted = 0
+
+    client = get_redis()
+    try:
+        if client:
+            batch = []
+            for key in client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += client.unlink(*batch)
+            redis_breaker.record_success()
+    except RedisError as e:
+        redis_breaker.record_failure(e)
+    except Exception as e:
+        print(f"Cache purge error: {e}")
+    return deleted
+
+# Single-flight recomputation. Values are stored as {'value', 'fresh_until'}
+# envelopes: fresh until soft_ttl, kept until hard_ttl. Only one caller (per
+# process via a local lock, across workers via a short Redis lock) recomputes
+# a key; the others are served the stale value or wait for the leader.
+LAST_VALUE_PREFIX = 'last:'
+_flight_locks = {}
+_flight_locks_guard = threading.Lock()
+
+def _acquire_flight(key, lock_ttl):
+    """Try to become the one caller recomputing key; returns a release function or None"""
+    with _flight_locks_guard:
+        local_lock = _flight_locks.setdefault(key, threading.Lock())
+    if not local_lock.acquire(blocking=False):
+        return None
+
+    redis_lock = None
+    client = get_redis()
+    try:
+        if client:
+            redis_lock = client.lock(f'lock:{key}', timeout=lock_ttl, blocking=False)
+            if not redis_lock.acquire():
+                local_lock.release()
+                return None
+    except RedisError as e:
+        redis_breaker.record_failure(e)
+        redis_lock = None
+
+    def release():
+        try:
+            if redis_lock:
+                redis_lock.release()
+        except RedisError:
+            pass  # expired or Redis went away; the lock times out on its own
+        finally:
+            with _flight_locks_guard:
+                local_lock.release()
+                _flight_locks.pop(key, None)
+
+    return release
+
+def _cached_envelope(key):
+    """The {value, fresh_until} envelope stored under key, or None.
+
+    Keys written by a plain cache_set() before their call site moved to
+    cache_get_or_compute() hold bare values; those count as misses.
+    """
+    entry = cache_get(key)
+    if isinstance(entry, dict) and 'value' in entry and isinstance(entry.get('fresh_until'), (int, float)):
+        return entry
+    return None
+
+def cache_get_or_compute(key, compute, soft_ttl=60, hard_ttl=300, lock_ttl=10, serve_stale=True):
+    """Cached value for key, recomputed by at most one caller at a time.
+
+    Between soft_ttl and hard_ttl the stale value is served while one caller
+    recomputes it. With serve_stale, the last value computed before the key's
+    namespace was invalidated is served the same way; call sites that need
+    read-your-writes pass serve_stale=False and wait for the recomputation.
+    """
+    entry = _cached_envelope(key)
+    if entry and time.time() < entry['fresh_until']:
+        return entry['value']
+
+    if entry is None and serve_stale:
+        entry = _cached_envelope(LAST_VALUE_PREFIX + key)
+
+    release = _acquire_flight(key, lock_ttl)
+    if release:
+        try:
+            with primary_reads():
+                value = compute()
+            envelope = {'value': value, 'fresh_until': time.time() + soft_ttl}
+            cache_set(key, envelope, hard_ttl)
+            if serve_stale:
+                cache_set(LAST_VALUE_PREFIX + key, envelope, hard_ttl)
+            return value
+        finally:
+            release()
+
+    if entry:
+        return entry['value']
+
+    # Another caller is computing and there is nothing to serve meanwhile
+    deadline = time.monotonic() + lock_ttl
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = _cached_envelope(key)
+        if entry:
+            return entry['value']
+
+    return compute()
+
+def doctor_dashboard_key(doctor_id):
+    """Cache key for a doctor's dashboard; dated so it rolls over at midnight"""
+    return f'doctor:{doctor_id}:dashboard:{date.today().isoformat()}'
+
+def invalidate_doctor_dashboard(doctor_id):
+    """Drop a doctor's cached dashboard after any change to their appointments or profile"""
+    return cache_invalidate(f'doctor:{doctor_id}')
@@ -0,0 +1,227 @@
+from flask import current_app
+from sqlalchemy import func, or_
+from sqlalchemy import types
+from app import db
+from app.models import User, Doctor, Department, Appointment, Treatment
+from datetime import datetime, timedelta
+import json
+import os
+import shutil
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional; the columnar export is unavailable without it
+    pa = pq = None
+
+MANIFEST = '_manifest.json'
+STAGING = '_staging'
+
+
+def warehouse_available():
+    """Whether pyarrow is installed"""
+    return pa is not None
+
+
+def export_tables():
+    """Per exported table: its query (last column is the partition date) and its updated_at column"""
+    return {
+        'departments': (db.session.query(
+            Department.id,
+            Department.name,
+            Department.description,
+            Department.created_at,
+            Department.updated_at,
+            func.coalesce(Department.updated_at, Department.created_at).label('partition_date')
+        ).order_by('partition_date', Department.id), Department.updated_at),
+
+        'doctors': (db.session.query(
+            Doctor.id,
+            Doctor.user_id,
+            User.full_name,
+            User.is_active,
+            Doctor.department_id,
+            Doctor.specialization,
+            Doctor.qualification,
+            Doctor.experience_years,
+            Doctor.consultation_fee,
+            Doctor.created_at,
+            Doctor.updated_at,
+            func.coalesce(Doctor.updated_at, Doctor.created_at).label('partition_date')
+        ).join(User, User.id == Doctor.user_id).order_by('partition_date', Doctor.id), Doctor.updated_at),
+
+        'appointments': (db.session.query(
+            Appointment.id,
+            Appointment.patient_id,
+            Appointment.doctor_id,
+            Appointment.appointment_date,
+            Appointment.appointment_time,
+            Appointment.status,
+            Appointment.reason,
+            Appointment.notes,
+            Appointment.created_at,
+            Appointment.updated_at,
+            Appointment.appointment_date.label('partition_date')
+        ).order_by(Appointment.appointment_date, Appointment.id), Appointment.updated_at),
+
+        # Partitioned by the appointment's month so both tables prune the same way
+        'treatments': (db.session.query(
+            Treatment.id,
+            Treatment.appointment_id,
+            Treatment.diagnosis,
+            Treatment.prescription,
+            Treatment.treatment_notes,
+            Treatment.next_visit_date,
+            Treatment.created_at,
+            Treatment.updated_at,
+            Appointment.appointment_date.label('partition_date')
+        ).select_from(Treatment).join(
+            Appointment, Appointment.id == Treatment.appointment_id
+        ).order_by(Appointment.appointment_date, Treatment.id), Treatment.updated_at),
+    }
+
+
+def arrow_type(column_type):
+    """Arrow type for a SQLAlchemy column type"""
+    if isinstance(column_type, types.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, types.Integer):
+        return pa.int64()
+    if isinstance(column_type, (types.Float, types.Numeric)):
+        return pa.float64()
+    if isinstance(column_type, types.DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, types.Date):
+        return pa.date32()
+    if isinstance(column_type, types.Time):
+        return pa.time64('us')
+    return pa.string()
+
+
+def arrow_schema(query):
+    """Arrow schema of a query's columns, leaving out the trailing partition date"""
+    return pa.schema([
+        (column['name'], arrow_type(column['type']))
+        for column in query.column_descriptions[:-1]
+    ])
+
+
+def to_arrow(rows, schema):
+    """Transpose a batch of row tuples into an Arrow table"""
+    columns = zip(*rows)
+    return pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+def write_table(name, query, directory, run_id, batch_size):
+    """Stream a query into <directory>/<name>/month=YYYY-MM/part-<run_id>.parquet; returns (rows, files).
+
+    Rows arrive ordered by partition, so one file is open at a time and
+    at most batch_size rows are held in memory; each batch is a row group.
+    """
+    schema = arrow_schema(query)
+    writer = month = None
+    batch = []
+    rows = files = 0
+
+    try:
+        for row in query.yield_per(batch_size):
+            row_month = row[-1].strftime('%Y-%m') if row[-1] else 'unknown'
+            if batch and (row_month != month or len(batch) >= batch_size):
+                writer.write_table(to_arrow(batch, schema))
+                batch = []
+            if row_month != month:
+                if writer:
+                    writer.close()
+                month = row_month
+                partition = os.path.join(directory, name, f'month={month}')
+                os.makedirs(partition, exist_ok=True)
+                writer = pq.ParquetWriter(os.path.join(partition, f'part-{run_id}.parquet'), schema)
+                files += 1
+            batch.append(row[:-1])
+            rows += 1
+
+        if batch:
+            writer.write_table(to_arrow(batch, schema))
+    finally:
+        if writer:
+            writer.close()
+
+    return rows, files
+
+
+def read_manifest(root):
+    """Watermarks of the last successful run, per table"""
+    try:
+        with open(os.path.join(root, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'tables': {}}
+
+
+def publish(root, staged, name, full):
+    """Move a table's staged files into place; a full export replaces everything already there"""
+    source = os.path.join(staged, name)
+    target = os.path.join(root, name)
+
+    if full:
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        if os.path.isdir(source):
+            os.replace(source, target)
+        return
+
+    if not os.path.isdir(source):
+        return
+    for partition in os.listdir(source):
+        os.makedirs(os.path.join(target, partition), exist_ok=True)
+        for filename in os.listdir(os.path.join(source, partition)):
+            os.replace(os.path.join(source, partition, filename), os.path.join(target, partition, filename))
+
+
+def run_export(full=False, progress=None):
+    """Export every table to WAREHOUSE_DIR as month-partitioned Parquet.
+
+    Tables are incremental from their last watermark unless full is set or
+    they were never exported. Rows updated within the last
+    WAREHOUSE_SETTLE_SECONDS wait for the next run, so transactions still
+    in flight are not skipped. Nothing is visible until every table is written.
+    """
+    root = current_app.config['WAREHOUSE_DIR']
+    batch_size = current_app.config['WAREHOUSE_BATCH_SIZE']
+    run_id = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    until = datetime.utcnow() - timedelta(seconds=current_app.config['WAREHOUSE_SETTLE_SECONDS'])
+
+    os.makedirs(root, exist_ok=True)
+    manifest = read_manifest(root)
+    staged = os.path.join(root, STAGING, run_id)
+    tables = export_tables()
+    summary = {}
+
+    try:
+        for index, (name, (query, updated_at)) in enumerate(tables.items()):
+            since = None if full else manifest['tables'].get(name, {}).get('watermark')
+            if since:
+                query = query.filter(updated_at > datetime.fromisoformat(since), updated_at <= until)
+            else:
+                query = query.filter(or_(updated_at <= until, updated_at.is_(None)))
+
+            rows, files = write_table(name, query, staged, run_id, batch_size)
+            summary[name] = {'full': since is None, 'since': since, 'rows': rows, 'files': files}
+            if progress:
+                progress(index + 1, len(tables), name)
+
+        for name, info in summary.items():
+            publish(root, staged, name, info['full'])
+            manifest['tables'][name] = {'watermark': until.isoformat(), 'run_id': run_id}
+
+        partial = os.path.join(root, MANIFEST + '.part')
+        with open(partial, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(partial, os.path.join(root, MANIFEST))
+    finally:
+        shutil.rmtree(staged, ignore_errors=True)
+
+    return {'run_id': run_id, 'until': until.isoformat(), 'tables': summary}
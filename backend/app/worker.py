@@ -0,0 +1,11 @@
+"""
+Celery entry point. Builds the Flask app once per worker, so tasks only push its context.
+
+    celery -A app.worker worker --loglevel=info
+    celery -A app.worker beat --loglevel=info
+"""
+
+from app import create_app
+
+flask_app = create_app()
+celery = flask_app.extensions['celery']
@@ -0,0 +1,77 @@
+"""
+Login Throughput Benchmark
+Measures logins per second against a throwaway SQLite database, hashing
+inline and in the password hashing pool.
+
+Usage: python benchmark_login.py [--users 20] [--threads 8] [--rounds 3]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+db_file = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+os.environ.setdefault('LOGIN_RATE_LIMIT', '1000000')
+os.environ.setdefault('LOGIN_IP_RATE_LIMIT', '1000000')
+
+from app import create_app, db
+from app.models import User
+from app.passwords import password_hasher
+
+
+def run(app, users, threads, rounds):
+    def login(username):
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={'username': username, 'password': 'benchmark'})
+        assert response.status_code == 200, response.get_json()
+
+    usernames = [user for user in users for _ in range(rounds)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(login, usernames))
+    elapsed = time.perf_counter() - started
+    return len(usernames) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    pool_workers = app.config['PASSWORD_HASH_WORKERS'] or os.cpu_count()
+    usernames = [f'bench{i}' for i in range(args.users)]
+
+    with app.app_context():
+        for username, password_hash in zip(usernames, password_hasher.hash_many(['benchmark'] * args.users)):
+            db.session.add(User(
+                username=username,
+                email=f'{username}@example.com',
+                role='patient',
+                full_name=username,
+                password_hash=password_hash
+            ))
+        db.session.commit()
+
+    print(f"Method: {app.config['PASSWORD_HASH_METHOD']}, {args.threads} client threads, "
+          f"{args.users * args.rounds} logins per run")
+
+    for label, workers in [('inline', 0), (f'pool ({pool_workers} workers)', pool_workers)]:
+        password_hasher.configure(
+            app.config['PASSWORD_HASH_METHOD'],
+            workers,
+            max(app.config['PASSWORD_HASH_MAX_PENDING'], args.threads),
+            app.config['PASSWORD_HASH_WAIT_TIMEOUT']
+        )
+        print(f"{label:>24}: {run(app, usernames, args.threads, args.rounds):.1f} logins/s")
+
+    os.remove(db_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+Doctor Listing Benchmark
+Seeds a throwaway SQLite database with 1,000 doctors, each available for the
+next 7 days, and times the patient doctor search and the admin doctor list
+before and after batching: the old per-doctor lookups (rebuilt here) against
+the current endpoints. Caches are emptied before every request.
+
+Usage: python benchmark_search.py [--doctors 1000] [--rounds 5]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, time as clock, timedelta
+
+db_file = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.setdefault('LOGIN_RATE_LIMIT', '1000000')
+os.environ.setdefault('LOGIN_IP_RATE_LIMIT', '1000000')
+
+from sqlalchemy import event
+from app import create_app, db
+from app.local_cache import local_cache
+from app.models import User, Doctor, Patient, Department, DoctorAvailability
+from app.passwords import password_hasher
+from app.queries import MAX_PAGE_SIZE
+
+DEPARTMENTS = 10
+
+
+def seed(app, doctors):
+    """`doctors` active doctors across a few departments, each with a window on each of the next 7 days"""
+    today = date.today()
+    with app.app_context():
+        db.session.execute(db.insert(Department), [
+            {'id': i + 1, 'name': f'Department {i + 1}'} for i in range(DEPARTMENTS)
+        ])
+        first_user = db.session.query(db.func.max(User.id)).scalar() + 1
+        db.session.execute(db.insert(User), [{
+            'id': first_user + i,
+            'username': f'bench_doctor{i}',
+            'email': f'bench_doctor{i}@example.com',
+            'password_hash': '-',
+            'role': 'doctor',
+            'full_name': f'Bench Doctor {i}'
+        } for i in range(doctors)])
+        db.session.execute(db.insert(Doctor), [{
+            'id': i + 1,
+            'user_id': first_user + i,
+            'department_id': i % DEPARTMENTS + 1,
+            'specialization': 'General'
+        } for i in range(doctors)])
+        db.session.execute(db.insert(DoctorAvailability), [{
+            'doctor_id': i + 1,
+            'date': today + timedelta(days=day),
+            'start_time': clock(9),
+            'end_time': clock(17)
+        } for i in range(doctors) for day in range(7)])
+
+        patient_user = User(username='bench_patient', email='bench_patient@example.com', role='patient',
+                            full_name='Bench Patient', password_hash=password_hasher.hash('benchmark'))
+        db.session.add(patient_user)
+        db.session.flush()
+        db.session.add(Patient(user_id=patient_user.id))
+        db.session.commit()
+
+
+def per_doctor_search():
+    """Patient doctor search as it was: one availability query per doctor"""
+    doctors = Doctor.query.join(Doctor.user).filter(Doctor.user.has(is_active=True)).all()
+    today = date.today()
+    next_week = today + timedelta(days=7)
+
+    result = []
+    for doctor in doctors:
+        doctor_data = doctor.to_dict()
+        availabilities = DoctorAvailability.query.filter(
+            DoctorAvailability.doctor_id == doctor.id,
+            DoctorAvailability.date >= today,
+            DoctorAvailability.date <= next_week,
+            DoctorAvailability.is_available == True
+        ).all()
+        doctor_data['availability'] = [avail.to_dict() for avail in availabilities]
+        result.append(doctor_data)
+    return result
+
+
+def per_doctor_admin_list():
+    """Admin doctor list as it was: everything at once, user and department loaded per doctor"""
+    return [doctor.to_dict() for doctor in Doctor.query.join(User).all()]
+
+
+def measure(app, engine, call, rounds):
+    """(median seconds, statements) of call() with the in-process cache emptied each round"""
+    statements = []
+
+    def record(*args):
+        statements.append(args[2])
+
+    timings = []
+    for _ in range(rounds):
+        local_cache.clear()
+        statements.clear()
+        event.listen(engine, 'before_cursor_execute', record)
+        started = time.perf_counter()
+        try:
+            call()
+        finally:
+            timings.append(time.perf_counter() - started)
+            event.remove(engine, 'before_cursor_execute', record)
+    return statistics.median(timings), len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doctors', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['SESSION_COOKIE_SECURE'] = False
+    seed(app, args.doctors)
+
+    patient, admin = app.test_client(), app.test_client()
+    for client, username, password in ((patient, 'bench_patient', 'benchmark'), (admin, 'admin', 'admin123')):
+        response = client.post('/api/auth/login', json={'username': username, 'password': password})
+        assert response.status_code == 200, response.get_json()
+
+    def in_app_context(function):
+        def call():
+            with app.app_context():
+                function()
+                db.session.remove()
+        return call
+
+    def search_endpoint():
+        response = patient.get('/api/patient/doctors')
+        assert response.status_code == 200 and len(response.get_json()) == args.doctors
+
+    def admin_endpoint():
+        cursor, count = None, 0
+        while True:
+            url = f'/api/admin/doctors?limit={MAX_PAGE_SIZE}' + (f'&cursor={cursor}' if cursor else '')
+            page = admin.get(url).get_json()
+            count += len(page['items'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        assert count == args.doctors
+
+    with app.app_context():
+        engine = db.engine
+
+    runs = [
+        ('patient search, per doctor', in_app_context(per_doctor_search)),
+        ('GET /api/patient/doctors', search_endpoint),
+        ('admin list, per doctor', in_app_context(per_doctor_admin_list)),
+        (f'GET /api/admin/doctors (pages of {MAX_PAGE_SIZE})', admin_endpoint),
+    ]
+
+    print(f"{args.doctors} doctors x 7 availability windows, median of {args.rounds} runs")
+    for label, call in runs:
+        seconds, statements = measure(app, engine, call, args.rounds)
+        print(f"{label:<38} {seconds * 1000:8.1f} ms  {statements:5d} queries")
+
+    engine.dispose()
+    os.remove(db_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Celery Task Startup Benchmark
+Compares the per-task overhead of building the Flask app inside every task
+(the old pattern) with running tasks in the worker's shared app context.
+Tasks run eagerly in this process, so no broker is needed.
+
+Usage: python benchmark_tasks.py [--tasks 50]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+db_file = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+from app import create_app
+from app.celery_app import celery
+
+
+@celery.task
+def noop_task():
+    """Does nothing, so only the task startup cost is measured"""
+    return None
+
+
+def per_task_app(count):
+    started = time.perf_counter()
+    for _ in range(count):
+        app = create_app()
+        with app.app_context():
+            pass
+    return (time.perf_counter() - started) / count
+
+
+def shared_app(count):
+    started = time.perf_counter()
+    for _ in range(count):
+        noop_task.apply()
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=50)
+    args = parser.parse_args()
+
+    create_app()  # the worker builds its app once at startup
+
+    old = per_task_app(args.tasks)
+    new = shared_app(args.tasks)
+    print(f"{args.tasks} tasks")
+    print(f"create_app() per task: {old * 1000:.2f} ms/task")
+    print(f"    shared app context: {new * 1000:.2f} ms/task")
+
+    os.remove(db_file)
+
+
+if __name__ == '__main__':
+    main()
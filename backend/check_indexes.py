@@ -0,0 +1,239 @@
+"""
+Index Usage Check
+Calls the appointment hot paths (slot grid, availability check, booking,
+patient and doctor dashboards, appointment lists and admin keyset paging),
+captures every SELECT they send against the appointments and
+doctor_availability tables and runs EXPLAIN on it. Each access to those
+tables must go through an index, and each path must use the indexes added
+for it (walking an unrelated index end to end is a full scan too); the script
+exits non-zero otherwise.
+
+SQLite (default, throwaway database): EXPLAIN QUERY PLAN must show
+SEARCH/SCAN ... USING [COVERING] INDEX or a primary key lookup. PostgreSQL (--database-url, use a
+scratch database): EXPLAIN (FORMAT JSON) with enable_seqscan off must not
+contain a Seq Scan on them.
+
+Usage: python check_indexes.py [--database-url URL]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import date, time, timedelta
+
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+os.environ.setdefault('LOGIN_IP_RATE_LIMIT', '1000000')
+os.environ.setdefault('LOGIN_RATE_LIMIT', '1000000')
+
+CHECKED_TABLES = ('appointments', 'doctor_availability')
+INDEX_SCANS = ('Index Scan', 'Index Only Scan', 'Bitmap Heap Scan')
+
+# Alternatives any of which serves a doctor's booked slots
+DOCTOR_SLOT = ('ix_appointments_doctor_slot', 'uq_appointments_booked_slot')
+AVAILABILITY = ('ix_doctor_availability_doctor_date',)
+PATIENT = ('ix_appointments_patient_status_date',)
+KEYSET = ('ix_appointments_date_id',)
+
+
+def seed(app):
+    """A doctor with a week of availability, a patient and a few appointments around today"""
+    from app import db
+    from app.models import User, Doctor, Patient, Appointment, DoctorAvailability, Treatment
+
+    today = date.today()
+    with app.app_context():
+        doctor_user = User(username='index_check_doctor', email='index_check_doctor@example.com',
+                           role='doctor', full_name='Index Check Doctor')
+        doctor_user.set_password('check')
+        patient_user = User(username='index_check_patient', email='index_check_patient@example.com',
+                            role='patient', full_name='Index Check Patient')
+        patient_user.set_password('check')
+        db.session.add_all([doctor_user, patient_user])
+        db.session.flush()
+        doctor = Doctor(user_id=doctor_user.id, specialization='General')
+        patient = Patient(user_id=patient_user.id)
+        db.session.add_all([doctor, patient])
+        db.session.flush()
+
+        for day in range(8):
+            db.session.add(DoctorAvailability(doctor_id=doctor.id, date=today + timedelta(days=day),
+                                              start_time=time(9), end_time=time(17)))
+        for day, status in ((-2, 'completed'), (-1, 'cancelled'), (0, 'booked'), (2, 'booked')):
+            appointment = Appointment(doctor_id=doctor.id, patient_id=patient.id,
+                                      appointment_date=today + timedelta(days=day),
+                                      appointment_time=time(10), status=status)
+            db.session.add(appointment)
+            if status == 'completed':
+                db.session.flush()
+                db.session.add(Treatment(appointment_id=appointment.id, diagnosis='check'))
+        db.session.commit()
+        return doctor.id, patient.id
+
+
+def hot_paths(app, doctor_id, patient_id):
+    """(name, call, required) per hot path; call issues its requests and each entry of
+    required lists the indexes of which at least one must be used"""
+    clients = {}
+    for username, password in (('admin', 'admin123'), ('index_check_doctor', 'check'),
+                               ('index_check_patient', 'check')):
+        clients[username] = app.test_client()
+        response = clients[username].post('/api/auth/login', json={'username': username, 'password': password})
+        assert response.status_code == 200, response.get_json()
+    admin, doctor, patient = clients['admin'], clients['index_check_doctor'], clients['index_check_patient']
+
+    day = (date.today() + timedelta(days=3)).isoformat()
+
+    def expect(response, *codes):
+        assert response.status_code in codes, (response.request.path, response.get_json())
+        return response.get_json()
+
+    def admin_pages():
+        page = expect(admin.get('/api/admin/appointments?limit=2'), 200)
+        expect(admin.get(f"/api/admin/appointments?limit=2&cursor={page['next_cursor']}"), 200)
+        expect(admin.get(f'/api/admin/appointments?limit=2&doctor_id={doctor_id}&status=booked'), 200)
+        expect(admin.get(f'/api/admin/appointments?limit=2&patient_id={patient_id}'), 200)
+
+    return [
+        ('slot grid', lambda: expect(patient.get(f'/api/appointments/slots?doctor_id={doctor_id}'), 200),
+         [DOCTOR_SLOT, AVAILABILITY]),
+        ('batch slot grid', lambda: expect(patient.post('/api/appointments/slots/batch', json={
+            'doctor_ids': [doctor_id]}), 200), [DOCTOR_SLOT, AVAILABILITY]),
+        ('availability check', lambda: expect(patient.post('/api/appointments/check-availability', json={
+            'doctor_id': doctor_id, 'appointment_date': day, 'appointment_time': '11:00'}), 200),
+         [DOCTOR_SLOT, AVAILABILITY]),
+        ('booking', lambda: expect(patient.post('/api/appointments', json={
+            'doctor_id': doctor_id, 'appointment_date': day, 'appointment_time': '11:00'}), 201),
+         [AVAILABILITY]),
+        ('patient dashboard', lambda: expect(patient.get('/api/patient/dashboard'), 200), [PATIENT]),
+        ('patient appointments', lambda: expect(patient.get('/api/patient/appointments'), 200), [PATIENT]),
+        ('doctor dashboard', lambda: expect(doctor.get('/api/doctor/dashboard'), 200), [DOCTOR_SLOT]),
+        ('doctor appointments', lambda: expect(doctor.get('/api/doctor/appointments'), 200), [DOCTOR_SLOT]),
+        ('doctor availability', lambda: expect(doctor.get('/api/doctor/availability'), 200), [AVAILABILITY]),
+        ('admin keyset pages', admin_pages, [KEYSET, DOCTOR_SLOT, PATIENT]),
+    ]
+
+
+def capture_selects(engine, call):
+    """(statement, parameters) of every distinct SELECT on a checked table that call() sends"""
+    from sqlalchemy import event
+    from app.local_cache import local_cache
+
+    pattern = re.compile(r'\b(FROM|JOIN)\s+"?(%s)"?\b' % '|'.join(CHECKED_TABLES), re.IGNORECASE)
+    captured = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT') and pattern.search(statement):
+            captured.setdefault(statement, parameters)
+
+    local_cache.clear()
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        call()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return list(captured.items())
+
+
+def explain_sqlite(connection, statement, parameters):
+    """(indexes used, full scans) on the checked tables according to EXPLAIN QUERY PLAN"""
+    used, scans = set(), []
+    for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters):
+        detail = row[-1]
+        match = re.match(r'(SEARCH|SCAN) (\w+)', detail)
+        if not match or match.group(2) not in CHECKED_TABLES:
+            continue
+        index = re.search(r'USING (?:COVERING )?INDEX (\w+)|USING (INTEGER PRIMARY KEY)', detail)
+        if index:
+            used.add(index.group(1) or 'primary key')
+        else:
+            scans.append(detail)
+    return used, scans
+
+
+def explain_postgres(connection, statement, parameters):
+    """(indexes used, full scans) on the checked tables according to EXPLAIN (FORMAT JSON)"""
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    used, scans = set(), []
+
+    def walk(node):
+        # A Bitmap Heap Scan reads the rows found by its Bitmap Index Scan child
+        if node.get('Relation Name') in CHECKED_TABLES and node['Node Type'] not in INDEX_SCANS:
+            scans.append(f"{node['Node Type']} on {node['Relation Name']}")
+        if node.get('Index Name'):
+            used.add(node['Index Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return used, scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    db_file = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        db_file = os.path.join(tempfile.mkdtemp(), 'index_check.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+    from app import create_app, db
+
+    app = create_app()
+    app.config['SESSION_COOKIE_SECURE'] = False
+    if app.extensions['schema_problems']:
+        sys.exit('Database schema is out of date; run the migrations first')
+
+    doctor_id, patient_id = seed(app)
+    paths = hot_paths(app, doctor_id, patient_id)
+
+    with app.app_context():
+        engine = db.engine
+
+    postgres = engine.dialect.name == 'postgresql'
+    explain = explain_postgres if postgres else explain_sqlite
+
+    failures = []
+    with engine.connect() as connection:
+        if postgres:
+            # Tiny tables make a sequential scan cheapest; only a missing index should force one
+            connection.exec_driver_sql('SET enable_seqscan = off')
+        for name, call, required in paths:
+            statements = capture_selects(engine, call)
+            indexes = set()
+            for statement, parameters in statements:
+                used, scans = explain(connection, statement, parameters)
+                indexes |= used
+                failures.extend((name, scan, statement) for scan in scans)
+            failures.extend(
+                (name, f"none of {', '.join(names)} used", None)
+                for names in required if not indexes & set(names)
+            )
+            print(f"{name:<22} {len(statements)} queries, indexes: {', '.join(sorted(indexes)) or '-'}")
+        connection.rollback()
+
+    if db_file:
+        engine.dispose()
+        os.remove(db_file)
+
+    for name, scan, statement in failures:
+        print(f"\n{name}: {scan}")
+        if statement:
+            print(f"  {' '.join(statement.split())}")
+    if failures:
+        sys.exit(f"FAILED: {len(failures)} hot path queries do not use their indexes")
+    print("OK: every hot path query uses an index")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Query Count Regression Check
+Seeds one doctor and one patient with N appointments (half of them completed
+with a treatment) and counts the SQL statements each appointment list path
+issues. Eager loading through app.queries must keep every count flat as N
+grows; the script exits non-zero if any count changes with N.
+
+Usage: python check_query_counts.py [--sizes 10 100 1000 10000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, time, timedelta
+
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+os.environ.setdefault('LOGIN_IP_RATE_LIMIT', '1000000')
+os.environ.setdefault('LOGIN_RATE_LIMIT', '1000000')
+
+# Every appointment starts today so the doctor dashboard sees the whole spread
+SLOTS_PER_DAY = 48
+
+
+def seed(app, count):
+    """One doctor, one patient and `count` appointments on distinct slots"""
+    from app import db
+    from app.models import User, Doctor, Patient, Appointment, Treatment
+
+    with app.app_context():
+        doctor_user = User(username='doctor', email='doctor@example.com', role='doctor', full_name='Doctor')
+        doctor_user.set_password('check')
+        patient_user = User(username='patient', email='patient@example.com', role='patient', full_name='Patient')
+        patient_user.set_password('check')
+        db.session.add_all([doctor_user, patient_user])
+        db.session.flush()
+        doctor = Doctor(user_id=doctor_user.id, specialization='General')
+        patient = Patient(user_id=patient_user.id)
+        db.session.add_all([doctor, patient])
+        db.session.flush()
+
+        today = date.today()
+        db.session.execute(db.insert(Appointment), [{
+            'id': i + 1,
+            'doctor_id': doctor.id,
+            'patient_id': patient.id,
+            'appointment_date': today + timedelta(days=i // SLOTS_PER_DAY),
+            'appointment_time': time((i % SLOTS_PER_DAY) // 2, 30 * (i % 2)),
+            'status': 'completed' if i % 2 else 'booked'
+        } for i in range(count)])
+        db.session.execute(db.insert(Treatment), [
+            {'appointment_id': i + 1, 'diagnosis': 'check'} for i in range(count) if i % 2
+        ])
+        db.session.commit()
+        return doctor.id, patient.id
+
+
+def count_queries(app, engine, call):
+    """Number of statements call() sends to the database, with the in-process cache emptied first"""
+    from sqlalchemy import event
+    from app.local_cache import local_cache
+
+    statements = []
+
+    def record(*args):
+        statements.append(args[2])
+
+    local_cache.clear()
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        call()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return len(statements)
+
+
+def measure(count):
+    """Statement counts of every appointment list path for a database of `count` appointments"""
+    db_file = os.path.join(tempfile.mkdtemp(), 'query_counts.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+
+    from app import create_app, db
+    from app.queries import appointment_query, serialize_appointments
+
+    app = create_app()
+    app.config['SESSION_COOKIE_SECURE'] = False
+    seed(app, count)
+
+    clients = {}
+    for username in ('admin', 'doctor', 'patient'):
+        clients[username] = app.test_client()
+        password = 'admin123' if username == 'admin' else 'check'
+        response = clients[username].post('/api/auth/login', json={'username': username, 'password': password})
+        assert response.status_code == 200, response.get_json()
+
+    def get(username, url):
+        def call():
+            response = clients[username].get(url)
+            assert response.status_code == 200, (url, response.get_json())
+        return call
+
+    def serialize_all():
+        with app.app_context():
+            serialize_appointments(appointment_query().all(), include_treatment=True)
+
+    with app.app_context():
+        engine = db.engine
+
+    counts = {
+        'appointment_query() + to_dict': count_queries(app, engine, serialize_all),
+        'GET /api/admin/appointments': count_queries(app, engine, get('admin', '/api/admin/appointments?limit=200')),
+        'GET /api/patient/appointments': count_queries(app, engine, get('patient', '/api/patient/appointments')),
+        'GET /api/doctor/appointments': count_queries(app, engine, get('doctor', '/api/doctor/appointments')),
+        'GET /api/doctor/dashboard': count_queries(app, engine, get('doctor', '/api/doctor/dashboard')),
+    }
+
+    engine.dispose()
+    os.remove(db_file)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    results = {size: measure(size) for size in args.sizes}
+
+    paths = list(results[args.sizes[0]])
+    width = max(len(path) for path in paths)
+    print(f"{'queries per request':<{width}}  " + '  '.join(f'N={size:<6}' for size in args.sizes))
+    growing = []
+    for path in paths:
+        counts = [results[size][path] for size in args.sizes]
+        print(f"{path:<{width}}  " + '  '.join(f'{count:<8}' for count in counts))
+        if len(set(counts)) > 1:
+            growing.append(path)
+
+    if growing:
+        sys.exit(f"FAILED: query count grows with N for {', '.join(growing)}")
+    print("OK: query counts are flat")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings, read with `gunicorn start_backend:app -c gunicorn.conf.py`
+
+Requests mostly wait on the database and Redis, so each worker process runs
+several threads (gthread) and keeps serving while one request is blocked on
+I/O. GUNICORN_WORKER_CLASS=sync restores one request per process.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
@@ -4,7 +4,10 @@ Run this after first starting the backend to populate with sample data for demos
 """
 
 from app import create_app, db
-from app.models import User, Department, Doctor, Patient, Appointment
+from app.search import search_backend
+from app.counters import counters_enabled, rebuild_counters
+from app.passwords import password_hasher
+from app.models import User, Department, Doctor, Patient, Appointment, DoctorAvailability
 from datetime import datetime, date, timedelta, time
 
 def init_sample_data():
@@ -74,7 +77,10 @@ def init_sample_data():
             }
         ]
 
-        for doctor_data in doctors_data:
+        # Hash all passwords up front, in parallel across the hashing pool
+        doctor_hashes = password_hasher.hash_many([doctor_data['password'] for doctor_data in doctors_data])
+
+        for doctor_data, password_hash in zip(doctors_data, doctor_hashes):
             user = User.query.filter_by(username=doctor_data['username']).first()
             if not user:
                 user = User(
@@ -84,7 +90,7 @@ def init_sample_data():
                     full_name=doctor_data['full_name'],
                     phone=doctor_data['phone']
                 )
-                user.set_password(doctor_data['password'])
+                user.password_hash = password_hash
                 db.session.add(user)
                 db.session.flush()
 
@@ -101,6 +107,21 @@ def init_sample_data():
 
         db.session.commit()
 
+        # Open 09:00-17:00 availability for the next 7 days so slots can be booked
+        today = date.today()
+        for doctor in Doctor.query.all():
+            for offset in range(7):
+                day = today + timedelta(days=offset)
+                if not DoctorAvailability.query.filter_by(doctor_id=doctor.id, date=day).first():
+                    db.session.add(DoctorAvailability(
+                        doctor_id=doctor.id,
+                        date=day,
+                        start_time=time(9, 0),
+                        end_time=time(17, 0)
+                    ))
+
+        db.session.commit()
+
         # Create Sample Patients
         patients_data = [
             {
@@ -125,7 +146,9 @@ def init_sample_data():
             }
         ]
 
-        for patient_data in patients_data:
+        patient_hashes = password_hasher.hash_many([patient_data['password'] for patient_data in patients_data])
+
+        for patient_data, password_hash in zip(patients_data, patient_hashes):
             user = User.query.filter_by(username=patient_data['username']).first()
             if not user:
                 user = User(
@@ -135,7 +158,7 @@ def init_sample_data():
                     full_name=patient_data['full_name'],
                     phone=patient_data['phone']
                 )
-                user.set_password(patient_data['password'])
+                user.password_hash = password_hash
                 db.session.add(user)
                 db.session.flush()
 
@@ -150,6 +173,11 @@ def init_sample_data():
 
         db.session.commit()
 
+        # Rows above bypass the route sync hooks, so refresh the search index
+        search_backend().rebuild()
+        if counters_enabled():
+            rebuild_counters()
+
         print("\n" + "="*50)
         print("Sample data initialized successfully!")
         print("="*50)
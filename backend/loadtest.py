@@ -0,0 +1,118 @@
+"""
+Read-Path Load Test
+Hammers the read endpoints of a running backend with many concurrent
+clients and reports requests per second and latency percentiles. Run it once
+per serving mode to compare, e.g.
+
+    GUNICORN_WORKER_CLASS=sync gunicorn start_backend:app -c gunicorn.conf.py
+    gunicorn start_backend:app -c gunicorn.conf.py
+    python loadtest.py http://localhost:5000 --clients 200 --duration 20
+
+Logs in once (admin by default) and shares the credentials across clients,
+so the login rate limit is not hit.
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = [
+    '/api/admin/dashboard',
+    '/api/admin/appointments?limit=50',
+    '/api/admin/doctors?limit=50',
+    '/api/admin/patients?limit=50',
+]
+
+
+def connect(base):
+    parts = urlsplit(base)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(parts.hostname, parts.port, timeout=30)
+
+
+def login(base, username, password):
+    """Headers that authenticate as username, for either AUTH_MODE"""
+    connection = connect(base)
+    connection.request('POST', '/api/auth/login', json.dumps({'username': username, 'password': password}),
+                       {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    body = json.loads(response.read() or b'{}')
+    if response.status != 200:
+        raise SystemExit(f"Login failed ({response.status}): {body.get('error')}")
+
+    if 'access_token' in body:
+        return {'Authorization': f"Bearer {body['access_token']}"}
+    # The session cookie is marked Secure, so send it by hand over plain HTTP
+    cookies = [header.split(';', 1)[0] for name, header in response.getheaders() if name.lower() == 'set-cookie']
+    return {'Cookie': '; '.join(cookies)}
+
+
+def client(base, paths, headers, deadline, results, lock):
+    connection = connect(base)
+    latencies = []
+    statuses = Counter()
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            statuses[response.status] += 1
+        except (OSError, http.client.HTTPException):
+            statuses['error'] += 1
+            connection.close()
+            connection = connect(base)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+    with lock:
+        results['latencies'].extend(latencies)
+        results['statuses'].update(statuses)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base_url')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--path', action='append', dest='paths', help='GET path to request; repeatable')
+    args = parser.parse_args()
+
+    paths = args.paths or DEFAULT_PATHS
+    headers = login(args.base_url, args.username, args.password)
+    results = {'latencies': [], 'statuses': Counter()}
+    lock = threading.Lock()
+
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=client, args=(args.base_url, paths, headers, deadline, results, lock))
+        for _ in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(results['latencies'])
+    print(f"{args.clients} clients, {args.duration:.0f}s, {len(paths)} paths")
+    print(f"requests/s: {len(latencies) / args.duration:.1f}")
+    print(f"latency ms: p50 {percentile(latencies, 0.5) * 1000:.1f}  "
+          f"p95 {percentile(latencies, 0.95) * 1000:.1f}  p99 {percentile(latencies, 0.99) * 1000:.1f}")
+    print(f"statuses: {dict(results['statuses'])}")
+
+
+if __name__ == '__main__':
+    main()
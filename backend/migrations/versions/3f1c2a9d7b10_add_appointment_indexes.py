@@ -0,0 +1,47 @@
+"""Add composite indexes for appointment and availability hot paths
+
+Revision ID: 3f1c2a9d7b10
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_appointments_doctor_slot', 'appointments',
+     ['doctor_id', 'appointment_date', 'appointment_time', 'status']),
+    ('ix_appointments_patient_status_date', 'appointments',
+     ['patient_id', 'status', 'appointment_date']),
+    ('ix_appointments_date_id', 'appointments',
+     ['appointment_date', 'id']),
+    ('ix_doctor_availability_doctor_date', 'doctor_availability',
+     ['doctor_id', 'date']),
+]
+
+
+def _existing_indexes(table):
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    # Tables are created by db.create_all(), which already builds these
+    # indexes on fresh databases; only add the ones that are missing.
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,41 @@
+"""Add partial unique index on booked doctor slots
+
+Revision ID: 8b4e6d21c5f3
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d21c5f3'
+down_revision = '3f1c2a9d7b10'
+branch_labels = None
+depends_on = None
+
+
+NAME = 'uq_appointments_booked_slot'
+
+
+def _exists():
+    inspector = sa.inspect(op.get_bind())
+    return NAME in {index['name'] for index in inspector.get_indexes('appointments')}
+
+
+def upgrade():
+    # Fails if the table already holds double-booked slots; cancel the
+    # duplicates before upgrading.
+    if not _exists():
+        op.create_index(
+            NAME, 'appointments', ['doctor_id', 'appointment_date', 'appointment_time'],
+            unique=True,
+            sqlite_where=sa.text("status = 'booked'"),
+            postgresql_where=sa.text("status = 'booked'")
+        )
+
+
+def downgrade():
+    if _exists():
+        op.drop_index(NAME, table_name='appointments')
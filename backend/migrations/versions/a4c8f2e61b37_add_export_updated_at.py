@@ -0,0 +1,59 @@
+"""Track updated_at on doctors and departments and index it for incremental exports
+
+Revision ID: a4c8f2e61b37
+Revises: e2d5b8a4f960
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8f2e61b37'
+down_revision = 'e2d5b8a4f960'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = ['doctors', 'departments']
+
+INDEXES = [
+    ('ix_appointments_updated_at', 'appointments'),
+    ('ix_treatments_updated_at', 'treatments'),
+    ('ix_doctors_updated_at', 'doctors'),
+    ('ix_departments_updated_at', 'departments'),
+]
+
+
+def _existing_columns(table):
+    inspector = sa.inspect(op.get_bind())
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+def _existing_indexes(table):
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    for table in COLUMNS:
+        if 'updated_at' not in _existing_columns(table):
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+            # Existing rows count as last changed when they were created
+            op.execute(f'UPDATE {table} SET updated_at = created_at')
+
+    for name, table in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, ['updated_at'])
+
+
+def downgrade():
+    for name, table in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
+
+    for table in reversed(COLUMNS):
+        if 'updated_at' in _existing_columns(table):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.drop_column('updated_at')
@@ -0,0 +1,36 @@
+"""Add stat_counters table for incrementally maintained dashboard counts
+
+Revision ID: c7a9e3f41d22
+Revises: 8b4e6d21c5f3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a9e3f41d22'
+down_revision = '8b4e6d21c5f3'
+branch_labels = None
+depends_on = None
+
+
+def _exists():
+    return sa.inspect(op.get_bind()).has_table('stat_counters')
+
+
+def upgrade():
+    # Rows are filled by rebuild_counters() on startup when DASHBOARD_COUNTERS is on
+    if not _exists():
+        op.create_table(
+            'stat_counters',
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('value', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    if _exists():
+        op.drop_table('stat_counters')
@@ -0,0 +1,39 @@
+"""Add doctor_stats table for running doctor dashboard totals
+
+Revision ID: e2d5b8a4f960
+Revises: c7a9e3f41d22
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2d5b8a4f960'
+down_revision = 'c7a9e3f41d22'
+branch_labels = None
+depends_on = None
+
+
+def _exists():
+    return sa.inspect(op.get_bind()).has_table('doctor_stats')
+
+
+def upgrade():
+    # Rows are created lazily by doctor_stats() on first dashboard read
+    if not _exists():
+        op.create_table(
+            'doctor_stats',
+            sa.Column('doctor_id', sa.Integer(), nullable=False),
+            sa.Column('total_patients', sa.Integer(), nullable=False),
+            sa.Column('total_appointments', sa.Integer(), nullable=False),
+            sa.Column('completed_appointments', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['doctor_id'], ['doctors.id']),
+            sa.PrimaryKeyConstraint('doctor_id')
+        )
+
+
+def downgrade():
+    if _exists():
+        op.drop_table('doctor_stats')
@@ -1,6 +1,9 @@
 from app import create_app
 
-app = create_app()
+# Password hashing processes (forkserver/spawn) re-import the launching script
+# as __mp_main__; they only hash and must not build another app
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,131 @@
+"""
+Double-Booking Stress Test
+Many patients book the same doctor slot at the same moment, round after
+round. Exactly one booking per slot may succeed; every other attempt must be
+rejected with 409 by the uq_appointments_booked_slot index. Runs against a
+throwaway SQLite database unless --database-url is given.
+
+Usage: python stress_booking.py [--threads 16] [--rounds 20] [--database-url URL]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--database-url')
+    return parser.parse_args()
+
+
+def setup(app, patients):
+    """One doctor available all day tomorrow and `patients` logged-in patient clients"""
+    from app import db
+    from app.models import User, Doctor, Patient, DoctorAvailability
+    from app.passwords import password_hasher
+
+    day = date.today() + timedelta(days=1)
+    with app.app_context():
+        user = User(username='stress_doctor', email='stress_doctor@example.com', role='doctor',
+                    full_name='Stress Doctor', password_hash='-')
+        db.session.add(user)
+        db.session.flush()
+        doctor = Doctor(user_id=user.id, specialization='General')
+        db.session.add(doctor)
+        db.session.flush()
+        db.session.add(DoctorAvailability(doctor_id=doctor.id, date=day, start_time=time(0), end_time=time(23, 30)))
+
+        password_hash = password_hasher.hash('stress')
+        for i in range(patients):
+            user = User(username=f'stress_patient{i}', email=f'stress_patient{i}@example.com', role='patient',
+                        full_name=f'Stress Patient {i}', password_hash=password_hash)
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Patient(user_id=user.id))
+        db.session.commit()
+        doctor_id = doctor.id
+
+    clients = []
+    for i in range(patients):
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={'username': f'stress_patient{i}', 'password': 'stress'})
+        assert response.status_code == 200, response.get_json()
+        clients.append(client)
+    return doctor_id, day, clients
+
+
+def book_together(clients, payload):
+    """Fire one booking per client for the same slot, released at once; returns the status codes"""
+    barrier = threading.Barrier(len(clients))
+
+    def book(client):
+        barrier.wait()
+        return client.post('/api/appointments', json=payload).status_code
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        return list(executor.map(book, clients))
+
+
+def main():
+    args = parse_args()
+    db_file = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        db_file = os.path.join(tempfile.mkdtemp(), 'stress.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+    os.environ.setdefault('LOGIN_IP_RATE_LIMIT', '1000000')
+
+    from app import create_app, db
+    from app.models import Appointment
+
+    app = create_app()
+    app.config['SESSION_COOKIE_SECURE'] = False
+    if app.extensions['schema_problems']:
+        sys.exit('Database schema is out of date; run the migrations first')
+
+    doctor_id, day, clients = setup(app, args.threads)
+
+    totals = Counter()
+    failed_slots = []
+    for round_number in range(args.rounds):
+        slot = f'{round_number // 2:02d}:{30 * (round_number % 2):02d}'
+        statuses = Counter(book_together(clients, {
+            'doctor_id': doctor_id,
+            'appointment_date': day.isoformat(),
+            'appointment_time': slot
+        }))
+        totals.update(statuses)
+
+        with app.app_context():
+            booked = Appointment.query.filter_by(
+                doctor_id=doctor_id, appointment_date=day, status='booked'
+            ).filter(Appointment.appointment_time == time(round_number // 2, 30 * (round_number % 2))).count()
+        if statuses[201] != 1 or booked != 1 or set(statuses) - {201, 409}:
+            failed_slots.append((slot, dict(statuses), booked))
+
+    print(f"{args.rounds} slots x {args.threads} concurrent bookings: {dict(totals)}")
+    for slot, statuses, booked in failed_slots:
+        print(f"  slot {slot}: responses {statuses}, {booked} booked rows")
+
+    if db_file:
+        with app.app_context():
+            db.engine.dispose()
+        os.remove(db_file)
+
+    if failed_slots:
+        sys.exit(f"FAILED: {len(failed_slots)} slots were not booked exactly once")
+    print("OK: every slot was booked exactly once")
+
+
+if __name__ == '__main__':
+    main()
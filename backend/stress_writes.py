@@ -0,0 +1,140 @@
+"""
+Concurrent Write Stress Test
+Several worker processes, each with its own app and engine like gunicorn
+workers, write to one SQLite file at the same time while reader processes
+query it. Every write transaction reads a shared counter, increments it and
+inserts a row. The run fails on any "database is locked" (or other
+OperationalError) and on lost writes: the counter and the row count must
+both equal the number of transactions.
+
+The engine profile comes from app/engine.py, so its environment overrides
+apply, e.g. SQLITE_JOURNAL_MODE=DELETE python stress_writes.py compares the
+rollback journal with WAL.
+
+Usage: python stress_writes.py [--writers 8] [--readers 4] [--transactions 200]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+
+COUNTER = 'stress_writes'
+
+
+def build_app(db_url):
+    os.environ['DATABASE_URL'] = db_url
+    from app import create_app
+    return create_app()
+
+
+def write(db_url, worker, transactions, start):
+    """Run the worker's write transactions; returns the error messages"""
+    from sqlalchemy.exc import OperationalError
+    from app import db
+    from app.models import StatCounter, Department
+
+    app = build_app(db_url)
+    errors = []
+    start.wait()
+    with app.app_context():
+        for i in range(transactions):
+            try:
+                db.session.get(StatCounter, COUNTER)
+                db.session.execute(
+                    StatCounter.__table__.update()
+                    .where(StatCounter.name == COUNTER)
+                    .values(value=StatCounter.value + 1)
+                )
+                db.session.add(Department(name=f'stress {worker}-{i}'))
+                db.session.commit()
+            except OperationalError as e:
+                db.session.rollback()
+                errors.append(str(e.orig))
+        db.engine.dispose()
+    return errors
+
+
+def read(db_url, reads, start):
+    """Run the reader's queries; returns the error messages"""
+    from sqlalchemy.exc import OperationalError
+    from app import db
+    from app.models import StatCounter, Department
+
+    app = build_app(db_url)
+    errors = []
+    start.wait()
+    with app.app_context():
+        for _ in range(reads):
+            try:
+                Department.query.count()
+                db.session.get(StatCounter, COUNTER)
+                db.session.commit()
+            except OperationalError as e:
+                db.session.rollback()
+                errors.append(str(e.orig))
+        db.engine.dispose()
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--transactions', type=int, default=200)
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    db_url = f'sqlite:///{db_file}'
+
+    # Create the schema once up front so the workers only write
+    app = build_app(db_url)
+    from app import db
+    from app.engine import engine_profile
+    from app.models import StatCounter, Department
+
+    with app.app_context():
+        db.session.add(StatCounter(name=COUNTER, value=0))
+        db.session.commit()
+        baseline = Department.query.count()
+    profile = engine_profile(db_url)
+
+    # Spawned workers start clean instead of inheriting this process's connections;
+    # the barrier releases them together once every app is built
+    context = multiprocessing.get_context('spawn')
+    with context.Manager() as manager, context.Pool(args.writers + args.readers) as pool:
+        start = manager.Barrier(args.writers + args.readers + 1)
+        writers = [pool.apply_async(write, (db_url, worker, args.transactions, start))
+                   for worker in range(args.writers)]
+        readers = [pool.apply_async(read, (db_url, args.transactions, start)) for _ in range(args.readers)]
+        start.wait()
+        started = time.perf_counter()
+        errors = [error for result in writers + readers for error in result.get()]
+        elapsed = time.perf_counter() - started
+
+    expected = args.writers * args.transactions
+    with app.app_context():
+        counter = db.session.get(StatCounter, COUNTER).value
+        rows = Department.query.count() - baseline
+        db.engine.dispose()
+    os.remove(db_file)
+
+    print(f"journal_mode={profile['SQLITE_JOURNAL_MODE']} synchronous={profile['SQLITE_SYNCHRONOUS']} "
+          f"busy_timeout={profile['SQLITE_BUSY_TIMEOUT_MS']}ms")
+    print(f"{args.writers} writers x {args.transactions} transactions, {args.readers} readers: {elapsed:.2f}s, "
+          f"{expected / elapsed:.0f} writes/s")
+    print(f"counter {counter}, rows {rows}, expected {expected}, errors {len(errors)}")
+    for error in sorted(set(errors)):
+        print(f"  {errors.count(error)} x {error}")
+
+    if errors or counter != expected or rows != expected:
+        sys.exit("FAILED: concurrent writes errored or were lost")
+    print("OK: every write landed without lock errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,12 +11,39 @@ axios.defaults.withCredentials = true
 axios.defaults.headers.common['Content-Type'] = 'application/json'
 
 
+// Send the bearer token when the backend runs with AUTH_MODE=token
+axios.interceptors.request.use(config => {
+  const token = localStorage.getItem('access_token')
+  if (token) {
+    config.headers.Authorization = `Bearer ${token}`
+  }
+  return config
+})
+
 // Add axios response interceptor for error handling
 axios.interceptors.response.use(
   response => response,
-  error => {
+  async error => {
+    const original = error.config
+    const refreshToken = localStorage.getItem('refresh_token')
+
+    // Access tokens are short-lived: refresh once and retry the request
+    if (error.response?.status === 401 && refreshToken && original && !original._retried && !original.url.includes('/api/auth/')) {
+      original._retried = true
+      try {
+        const response = await axios.post('/api/auth/refresh', { refresh_token: refreshToken })
+        localStorage.setItem('access_token', response.data.access_token)
+        localStorage.setItem('refresh_token', response.data.refresh_token)
+        return axios(original)
+      } catch (refreshError) {
+        // Fall through to the login redirect below
+      }
+    }
+
     if (error.response?.status === 401) {
       localStorage.removeItem('user')
+      localStorage.removeItem('access_token')
+      localStorage.removeItem('refresh_token')
       router.push('/login')
     }
     return Promise.reject(error)
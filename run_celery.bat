@@ -14,4 +14,4 @@ echo Starting Celery worker...
 echo Press Ctrl+C to stop
 echo.
 
-celery -A app.tasks.celery worker --pool=solo --loglevel=info
+celery -A app.worker worker --pool=solo --loglevel=info